@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import logging
 import os
+import sys
 
 from argparse import ArgumentParser
 
@@ -31,13 +32,24 @@ def getLevelNamesMapping():
     return logging._nameToLevel.keys()
 
 
-def launch(software_name: str, is_python_shell: bool = False) -> None:
+def launch(
+    software_name: str,
+    is_python_shell: bool = False,
+    python_args: list[str] | None = None,
+) -> None:
     software = find_implementation(DCCInterface, f"software.{software_name}")
-    software(is_python_shell).launch()
+    if python_args:
+        software(is_python_shell, python_args=python_args).launch()
+    else:
+        software(is_python_shell).launch()
 
 
 if __name__ == "__main__":
-    parser = ArgumentParser(description="Launch pipeline software")
+    parser = ArgumentParser(
+        description="Launch pipeline software",
+        epilog="With --python, arguments after -- are passed to the interpreter, "
+        "e.g. `maya --python -- -m pipe.m.playblast.batch jobs.json`",
+    )
     parser.add_argument(
         "software",
         help="launch the specified software",
@@ -58,13 +70,22 @@ if __name__ == "__main__":
         action="store_true",
     )
 
-    args = parser.parse_args()
+    # everything after -- goes to the DCC's python interpreter
+    argv = sys.argv[1:]
+    python_args: list[str] = []
+    if "--" in argv:
+        idx = argv.index("--")
+        argv, python_args = argv[:idx], argv[idx + 1 :]
+
+    args = parser.parse_args(argv)
+    if python_args and not args.python:
+        parser.error("arguments after -- require --python")
 
     logging.basicConfig(
         level=args.log_level,
         format="%(asctime)s %(processName)s(%(process)s) %(threadName)s [%(name)s(%(lineno)s)] [%(levelname)s] %(message)s",
     )
 
-    launch(args.software, args.python)
+    launch(args.software, args.python, python_args)
 
     log.info("Exiting")
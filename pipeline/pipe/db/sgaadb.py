@@ -150,7 +150,7 @@ class SGaaDB(DBInterface):
     def get_entities_by_stub(
         self, entity_type: type[SGEntity], stubs: Iterable[SGEntityStub]
     ) -> list[SGEntity]:
-        ids = [s.id for s in stubs]
+        ids = {s.id for s in stubs}
         return [
             entity_type.from_sg(e)
             for e in self._sg_entity_lists[entity_type.__name__]
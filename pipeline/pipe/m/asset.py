@@ -33,6 +33,8 @@ log = logging.getLogger(__name__)
 
 
 class _PublishAssetDialog(FilteredListDialog):
+    _background: QCheckBox
+    _incremental: QCheckBox
     _substance_only: QCheckBox
 
     def __init__(self, parent: QWidget | None, items: Sequence[str]) -> None:
@@ -49,6 +51,22 @@ class _PublishAssetDialog(FilteredListDialog):
         )
         self._layout.insertWidget(1, self._substance_only)
 
+        self._incremental = QCheckBox(
+            "Incremental publish (only re-export the parts that changed)"
+        )
+        self._layout.insertWidget(2, self._incremental)
+
+        self._background = QCheckBox("Publish in the background")
+        self._layout.insertWidget(3, self._background)
+
+    @property
+    def is_background(self) -> bool:
+        return self._background.isChecked()
+
+    @property
+    def is_incremental(self) -> bool:
+        return self._incremental.isChecked()
+
     @property
     def is_substance_only(self) -> bool:
         return self._substance_only.isChecked()
@@ -127,6 +145,12 @@ class AssetPublisher(Publisher):
             "shadingMode": "useRegistry",
         }
 
+    def _is_incremental(self) -> bool:
+        return cast(_PublishAssetDialog, self._dialog).is_incremental
+
+    def _is_background(self) -> bool:
+        return cast(_PublishAssetDialog, self._dialog).is_background
+
 
 class ModelChecker(MCUI):
     @classmethod
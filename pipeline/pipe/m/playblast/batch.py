@@ -0,0 +1,289 @@
+"""Batch playblasting.
+
+Runs a JSON list of playblast jobs across several Maya worker sessions and
+writes a manifest of the outputs and timings. The workers are full Maya
+sessions rather than mayapy, so userSetup runs and the playblasts have a
+viewport to capture. Launch through the pipeline so the environment is set
+up:
+
+    __main__.py maya --python -- -m pipe.m.playblast.batch jobs.json -w 4
+
+The jobs file looks like:
+
+    {
+        "lighting": true,
+        "shadows": false,
+        "builtin_huds": ["HUDCameraNames", "HUDCurrentFrame"],
+        "jobs": [
+            {
+                "scene": "/path/to/previs.mb",
+                "code": "A_010",
+                "camera": "A_010_cam",
+                "cut_in": 1001,
+                "cut_out": 1096,
+                "tails": [5, 5],
+                "paths": {"EDIT_SQ": ["/edit/previs/A_010"]}
+            }
+        ]
+    }
+
+`camera` may be null to playblast from the camera sequencer. If `cut_in`
+and `cut_out` are left out the cut info is looked up from ShotGrid by
+`code`. `paths` are keyed by `Playblaster.PRESET` name."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from env import Executables
+
+if TYPE_CHECKING:
+    import typing
+
+log = logging.getLogger(__name__)
+
+MODULE = "pipe.m.playblast.batch"
+DEFAULT_HUDS = ["HUDCameraNames", "HUDCurrentFrame", "HUDFocalLength"]
+# the JSON encoded arguments of a worker session
+WORKER_ENV = "LND_PB_WORKER"
+
+_WORKER_COMMAND = f'python("import {MODULE}; {MODULE}.gui_worker()")'
+
+
+def coordinate(
+    jobs_file: Path, workers: int, manifest_path: Path
+) -> dict[str, typing.Any]:
+    """Split the jobs between `workers` Maya sessions, wait for them and
+    merge their results into a manifest"""
+    settings = json.loads(jobs_file.read_text())
+    jobs: list[dict[str, typing.Any]] = settings.pop("jobs")
+
+    # keep jobs from the same scene together so it's only opened once
+    by_scene: dict[str, list[dict[str, typing.Any]]] = {}
+    for job in jobs:
+        by_scene.setdefault(job["scene"], []).append(job)
+    chunks: list[list[dict[str, typing.Any]]] = [[] for _ in range(workers)]
+    for scene_jobs in sorted(by_scene.values(), key=len, reverse=True):
+        min(chunks, key=len).extend(scene_jobs)
+    chunks = [c for c in chunks if c]
+
+    start = time.time()
+    results: list[dict[str, typing.Any]] = []
+    with tempfile.TemporaryDirectory(prefix="lnd_pb_batch_") as tmp:
+        procs: list[tuple[subprocess.Popen, list[dict[str, typing.Any]], Path]] = []
+        for idx, chunk in enumerate(chunks):
+            chunk_path = Path(tmp) / f"jobs.{idx}.json"
+            chunk_path.write_text(json.dumps({**settings, "jobs": chunk}))
+            part_path = Path(tmp) / f"manifest.{idx}.json"
+            worker_args = {
+                "jobs": str(chunk_path),
+                "manifest": str(part_path),
+                "log": str(part_path.with_suffix(".log")),
+            }
+            log.info(f"Starting worker {idx} with {len(chunk)} job(s)")
+            proc = subprocess.Popen(
+                [str(Executables.maya), "-command", _WORKER_COMMAND],
+                env={**os.environ, WORKER_ENV: json.dumps(worker_args)},
+            )
+            procs.append((proc, chunk, part_path))
+
+        for proc, chunk, part_path in procs:
+            returncode = proc.wait()
+            done = json.loads(part_path.read_text()) if part_path.exists() else []
+            results += done
+            if returncode:
+                log_path = part_path.with_suffix(".log")
+                worker_log = log_path.read_text() if log_path.exists() else ""
+                log.error(
+                    f"Worker {proc.pid} exited with code {returncode}:\n{worker_log}"
+                )
+
+            # record the jobs a crashed worker never got to
+            finished = {(r["scene"], r["code"]) for r in done}
+            results += [
+                _result(
+                    job, error=f"Worker exited with code {returncode}", worker=proc.pid
+                )
+                for job in chunk
+                if (job["scene"], job["code"]) not in finished
+            ]
+
+    manifest = {
+        "jobs_file": str(jobs_file),
+        "workers": len(chunks),
+        "total_time": time.time() - start,
+        "failed": sum(1 for r in results if r["error"]),
+        "results": results,
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=4))
+    return manifest
+
+
+def gui_worker() -> None:
+    """Entry point of the Maya sessions started by `coordinate`. Runs the
+    session's jobs once startup has finished, then quits Maya"""
+    import maya.cmds as mc
+
+    args = json.loads(os.environ[WORKER_ENV])
+    handler = logging.FileHandler(args["log"])
+    handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+    logging.getLogger().addHandler(handler)
+    logging.getLogger().setLevel(logging.INFO)
+
+    def inner() -> None:
+        exit_code = 1
+        try:
+            work(Path(args["jobs"]), Path(args["manifest"]))
+            exit_code = 0
+        except Exception:
+            log.exception("Playblast worker failed")
+        finally:
+            handler.close()
+            mc.quit(force=True, exitCode=exit_code)
+
+    # after userSetup, which loads the plugins and sets the workspace
+    mc.evalDeferred(inner, lowestPriority=True)
+
+
+def work(jobs_file: Path, manifest_path: Path) -> None:
+    """Playblast each job in this Maya session"""
+    import maya.cmds as mc
+
+    from pipe.util import Playblaster
+
+    from .playblaster import MPlayblaster
+    from .struct import MPlayblastConfig, MShotPlayblastConfig, dummy_shot
+
+    settings = json.loads(jobs_file.read_text())
+    playblaster = MPlayblaster()
+    results: list[dict[str, typing.Any]] = []
+
+    def write_manifest() -> None:
+        manifest_path.write_text(json.dumps(results, indent=4))
+
+    for job in settings["jobs"]:
+        try:
+            if Path(str(mc.file(query=True, sceneName=True))) != Path(job["scene"]):
+                open_start = time.time()
+                mc.file(job["scene"], open=True, force=True, prompt=False)
+                log.info(f"Opened {job['scene']} in {time.time() - open_start:.1f}s")
+
+            if "cut_in" in job and "cut_out" in job:
+                shot = dummy_shot(
+                    job["code"],
+                    job["cut_in"],
+                    job["cut_out"],
+                    job["cut_out"] - job["cut_in"] + 1,
+                )
+            else:
+                from env_sg import DB_Config
+
+                from pipe.db import DB
+
+                shot = DB.Get(DB_Config).get_shot_by_code(job["code"])
+
+            config = MPlayblastConfig(
+                builtin_huds=settings.get("builtin_huds", DEFAULT_HUDS),
+                custom_huds=[],
+                lighting=settings.get("lighting", True),
+                shadows=settings.get("shadows", False),
+                stream=settings.get("stream", False),
+                frame_cache=settings.get("frame_cache", False),
+                shots=[
+                    MShotPlayblastConfig(
+                        camera=job.get("camera"),
+                        shot=shot,
+                        paths={
+                            Playblaster.PRESET[preset]: paths
+                            for preset, paths in job["paths"].items()
+                        },
+                        tails=tuple(job.get("tails", (0, 0))),  # type: ignore[arg-type]
+                        use_sequencer=job.get("camera") is None,
+                    )
+                ],
+            )
+            (result,) = playblaster.configure(config).playblast()
+            results.append(
+                _result(
+                    job,
+                    outputs=[str(p) for p in result.outputs],
+                    capture_time=result.capture_time,
+                    encode_time=result.encode_time,
+                    error=str(result.error) if result.error else None,
+                )
+            )
+        except Exception as e:
+            log.exception(f"Failed to playblast {job['code']}")
+            results.append(_result(job, error=str(e)))
+
+        # keep the manifest current in case the process dies
+        write_manifest()
+
+    write_manifest()
+
+
+def _result(
+    job: dict[str, typing.Any],
+    outputs: list[str] | None = None,
+    capture_time: float = 0.0,
+    encode_time: float = 0.0,
+    error: str | None = None,
+    worker: int | None = None,
+) -> dict[str, typing.Any]:
+    return {
+        "scene": job["scene"],
+        "code": job["code"],
+        "outputs": outputs or [],
+        "capture_time": capture_time,
+        "encode_time": encode_time,
+        "error": error,
+        "worker": worker or os.getpid(),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Playblast shots in batch Maya sessions",
+        epilog=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("jobs", type=Path, help="Jobs JSON file")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=max(1, (os.cpu_count() or 2) // 4),
+        help="Number of Maya sessions (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-m",
+        "--manifest",
+        type=Path,
+        help="Where to write the manifest (default: next to the jobs file)",
+    )
+    args = parser.parse_args(argv)
+
+    manifest = coordinate(
+        args.jobs,
+        max(1, args.workers),
+        args.manifest or args.jobs.with_suffix(".manifest.json"),
+    )
+    log.info(
+        f"Playblasted {len(manifest['results'])} shot(s) in "
+        f"{manifest['total_time']:.0f}s, {manifest['failed']} failed"
+    )
+    sys.exit(1 if manifest["failed"] else 0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
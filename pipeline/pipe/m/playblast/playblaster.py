@@ -1,19 +1,36 @@
 from __future__ import annotations
 
 import copy
+import ctypes
+import hashlib
+import json
 import logging
+import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as oma2
 import maya.cmds as mc
+import maya.OpenMaya as om
+import maya.OpenMayaUI as omui
+import numpy as np
+import time
 
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from contextlib import contextmanager
 from typing import TYPE_CHECKING
 
-from mayacapture.capture import capture  # type: ignore[import-not-found]
-from pipe.util import Playblaster
+from mayacapture.capture import (  # type: ignore[import-not-found]
+    CameraOptions,
+    DisplayOptions,
+    capture,
+)
+from pipe.util import Playblaster, PlayblastResult
 
 from .struct import HudDefinition, MPlayblastConfig
 
 if TYPE_CHECKING:
-    from typing import Any, Generator
+    from collections.abc import Callable, Generator, Iterator, Sequence
+    from concurrent.futures import Future
+    from typing import Any
 
 log = logging.getLogger(__name__)
 
@@ -22,6 +39,9 @@ class MPlayblaster(Playblaster):
     _config: MPlayblastConfig
     _extra_kwargs: dict[str, Any]
 
+    # shots encoding in the background at once
+    ENCODE_WORKERS = 2
+
     def __init__(self) -> None:
         super().__init__()
 
@@ -29,22 +49,22 @@ class MPlayblaster(Playblaster):
         self._config = config
         return self
 
-    def _write_images(self, path: str) -> None:
+    def _write_images(self, path: str, frames: Sequence[int] | None = None) -> None:
         """Maya implementation of playblasting image frames"""
-        self._extra_kwargs["viewport2_options"].update(
-            {
-                "maxHardwareLights": 16,
-                "multiSampleEnable": True,
-                "ssaoEnable": True,
+        if frames is None:
+            frame_kwargs: dict[str, Any] = {
+                "start_frame": (self._shot.cut_in - 5),
+                "end_frame": (self._shot.cut_out + 5),
             }
-        )
+        else:
+            frame_kwargs = {"frame": list(frames), "raw_frame_numbers": True}
 
+        width, height = self.RESOLUTION
         capture(
-            width=1920,
-            height=816,
+            width=width,
+            height=height,
             filename=path,
-            start_frame=(self._shot.cut_in - 5),
-            end_frame=(self._shot.cut_out + 5),
+            **frame_kwargs,
             format="image",
             compression="png",
             off_screen=True,
@@ -55,14 +75,132 @@ class MPlayblaster(Playblaster):
             **self._extra_kwargs,
         )
 
-    def playblast(self) -> None:
-        with applied_hud(
-            self._config.builtin_huds, self._config.custom_huds
-        ), unselect_all():
+    def _metadata(self) -> dict[str, Any]:
+        return {
+            "source": str(mc.file(query=True, sceneName=True)),
+            "camera": self._extra_kwargs.get("camera") or "camera sequencer",
+            "builtin_huds": self._config.builtin_huds,
+            "custom_huds": [hud.name for hud in self._config.custom_huds],
+            "lighting": self._config.lighting,
+            "shadows": self._config.shadows,
+        }
+
+    def _frame_range(self, tails: tuple[int, int]) -> range:
+        return range(int(self._shot.cut_in) - 5, int(self._shot.cut_out) + 5 + 1)
+
+    def _frame_keys(self, frames: range, visible_only: bool = True) -> list[str]:
+        """Hash the playblast settings and the value of each time driven
+        animation curve on each frame. Curves driven by other inputs (set
+        driven keys) are hashed by their keys. Unless `visible_only` is
+        unset, only the curves returned by `visible_anim_curves` are hashed.
+        Edits to unanimated values aren't detected, so turn the cache off
+        after changing those"""
+        settings = hashlib.sha1(
+            json.dumps(
+                [
+                    self._extra_kwargs,
+                    self.RESOLUTION,
+                    self._config.builtin_huds,
+                    [(h.name, h.label, h.command()) for h in self._config.custom_huds],
+                ],
+                sort_keys=True,
+                default=str,
+            ).encode()
+        )
+
+        time_types = {
+            oma2.MFnAnimCurve.kAnimCurveTA,
+            oma2.MFnAnimCurve.kAnimCurveTL,
+            oma2.MFnAnimCurve.kAnimCurveTT,
+            oma2.MFnAnimCurve.kAnimCurveTU,
+        }
+        times = [om2.MTime(frame, om2.MTime.uiUnit()) for frame in frames]
+        columns: list[list[float]] = []
+
+        curves: list[om2.MObject] = []
+        if visible_only:
+            curves = visible_anim_curves()
+        else:
+            it = om2.MItDependencyNodes(om2.MFn.kAnimCurve)
+            while not it.isDone():
+                curves.append(it.thisNode())
+                it.next()
+
+        for curve in curves:
+            fn = oma2.MFnAnimCurve(curve)
+            # what the curve drives, so reconnecting a curve is caught
+            settings.update(fn.name().encode())
+            for plug in fn.findPlug("output", False).connectedTo(False, True):
+                settings.update(plug.name().encode())
+
+            if fn.animCurveType in time_types:
+                columns.append([fn.evaluate(t) for t in times])
+            else:
+                keys = [(fn.unitlessInput(i), fn.value(i)) for i in range(fn.numKeys)]
+                settings.update(repr(keys).encode())
+
+        values = np.array(columns, dtype=np.float64).reshape(len(columns), len(times))
+        prefix = settings.digest()
+        return [
+            hashlib.sha1(
+                prefix + str(frame).encode() + values[:, i].tobytes()
+            ).hexdigest()
+            for i, frame in enumerate(frames)
+        ]
+
+    @property
+    def can_stream(self) -> bool:
+        # streaming reads back a model panel, which batch sessions don't have
+        return not mc.about(batch=True)
+
+    def _iter_frames(self) -> Iterator[bytes]:
+        """Maya implementation of streaming image frames. Renders the same
+        frame range as `_write_images` in a model panel sized to
+        `RESOLUTION` and reads back the viewport color buffer"""
+        width, height = self.RESOLUTION
+        with stream_panel(width, height, self._extra_kwargs) as view:
+            img = om.MImage()
+            w_util, h_util = om.MScriptUtil(), om.MScriptUtil()
+            w_ptr, h_ptr = w_util.asUintPtr(), h_util.asUintPtr()
+
+            for frame in self._frame_range((5, 5)):
+                mc.currentTime(frame, update=True)
+                view.refresh(False, True)
+                view.readColorBuffer(img, True)
+                img.getSize(w_ptr, h_ptr)
+                size = (w_util.getUint(w_ptr), h_util.getUint(h_ptr))
+                if size != (width, height):
+                    raise RuntimeError(
+                        f"Read a {size[0]}x{size[1]} frame from the stream panel, "
+                        f"expected {width}x{height}"
+                    )
+
+                pixels = ctypes.cast(int(img.pixels()), ctypes.POINTER(ctypes.c_ubyte))
+                # the color buffer is RGBA with the bottom row first
+                rgba = np.ctypeslib.as_array(pixels, shape=(height, width, 4))
+                yield np.ascontiguousarray(rgba[::-1, :, :3]).tobytes()
+
+    def playblast(self) -> list[PlayblastResult]:
+        """Playblast all the configured shots. Each shot is encoded on a
+        worker thread while the next one is captured. A failed shot doesn't
+        stop the others; check the returned results"""
+        results: list[PlayblastResult] = []
+        huds = HudEvaluator(self._config.custom_huds, self._config.hud_profiler)
+        with (
+            applied_hud(self._config.builtin_huds, self._config.custom_huds, huds),
+            unselect_all(),
+            ThreadPoolExecutor(
+                self.ENCODE_WORKERS, thread_name_prefix="PlayblastEncode"
+            ) as pool,
+        ):
             # assemble kwargs from config options
             global_kwargs: dict[str, Any] = {
                 "viewport_options": {},
-                "viewport2_options": {},
+                "viewport2_options": {
+                    "maxHardwareLights": 16,
+                    "multiSampleEnable": True,
+                    "ssaoEnable": True,
+                },
             }
             if self._config.lighting:
                 global_kwargs["viewport_options"].update({"displayLights": "all"})
@@ -71,7 +209,11 @@ class MPlayblaster(Playblaster):
                 global_kwargs["viewport_options"].update({"shadows": True})
 
             # iterate over shots and playblast
+            encoding: set[Future[PlayblastResult]] = set()
             for shot_config in self._config.shots:
+                result = PlayblastResult(shot_config.shot.code)
+                results.append(result)
+
                 # assemble shot-specific kwargs
                 self._extra_kwargs = copy.deepcopy(global_kwargs)
                 if shot_config.use_sequencer:
@@ -79,16 +221,186 @@ class MPlayblaster(Playblaster):
                 else:
                     self._extra_kwargs["camera"] = shot_config.camera
 
-                with self(shot_config.shot):
-                    super()._do_playblast(
-                        shot_config.paths,
-                        shot_config.tails,
-                    )
+                # don't let captured images pile up faster than they encode
+                if len(encoding) >= self.ENCODE_WORKERS:
+                    encoding = wait(encoding, return_when=FIRST_COMPLETED).not_done
+
+                start = time.time()
+                try:
+                    with self(shot_config.shot):
+                        huds.prepare(
+                            self._frame_range(shot_config.tails),
+                            None if shot_config.use_sequencer else shot_config.camera,
+                        )
+                        encode = super()._capture(
+                            shot_config.paths,
+                            shot_config.tails,
+                            stream=self._config.stream
+                            and not shot_config.use_sequencer,
+                            cache=self._config.frame_cache,
+                            # the sequencer can't be streamed
+                            stream_fallback=not shot_config.use_sequencer,
+                        )
+                except Exception as e:
+                    log.exception(f"Failed to capture {result.shot}")
+                    result.error = e
+                    continue
+                finally:
+                    result.capture_time = time.time() - start
+                    huds.log_timings(result.shot)
+
+                encoding.add(pool.submit(result.encode, encode))
+
+        return results
+
+
+class HudEvaluator:
+    """Evaluates custom HUD commands during a playblast. Results are
+    memoized per (frame, camera) so HUDs that refresh on idle only run their
+    command once per frame, and HUDs with a `precompute` are filled in for
+    the whole frame range before the capture starts. The time spent on each
+    evaluation is passed to `profiler` and summarized per shot"""
+
+    camera: str | None
+    profiler: Callable[[str, float, float], None] | None
+    timings: dict[str, list[float]]
+
+    _cache: dict[tuple[str, int, str | None], str]
+    _huds: list[HudDefinition]
+
+    def __init__(
+        self,
+        huds: list[HudDefinition],
+        profiler: Callable[[str, float, float], None] | None = None,
+    ) -> None:
+        self.camera = None
+        self.profiler = profiler
+        self.timings = defaultdict(list)
+        self._cache = {}
+        self._huds = huds
+
+    def prepare(self, frames: range, camera: str | None) -> None:
+        """Set the camera being captured (None for the sequencer) and run the
+        HUDs' precompute hooks over `frames`"""
+        self.camera = camera
+        self.timings.clear()
+        for hud in self._huds:
+            if hud.precompute is None:
+                continue
+            start = time.perf_counter()
+            values = hud.precompute(frames, camera)
+            self._cache.update(
+                {(hud.name, frame, camera): value for frame, value in values.items()}
+            )
+            log.debug(
+                f"Precomputed {hud.name} for {len(values)} frames in "
+                f"{time.perf_counter() - start:.3f}s"
+            )
+
+    def command(self, hud: HudDefinition) -> Callable[[], str]:
+        """Wrap `hud`'s command to memoize and time it"""
+
+        def inner() -> str:
+            start = time.perf_counter()
+            frame = self._frame()
+            key = (hud.name, frame, self.camera)
+            try:
+                value = self._cache[key]
+            except KeyError:
+                value = self._cache[key] = hud.command()
+
+            elapsed = time.perf_counter() - start
+            self.timings[hud.name].append(elapsed)
+            if self.profiler:
+                self.profiler(hud.name, frame, elapsed)
+            return value
+
+        return inner
+
+    def log_timings(self, shot: str) -> None:
+        for name, times in self.timings.items():
+            log.info(
+                f"{shot}: HUD {name} evaluated {len(times)} times, "
+                f"{sum(times) / len(times) * 1000:.3f}ms each"
+            )
+
+    def _frame(self) -> int:
+        # sequencer playblasts run in sequence time, which can map several
+        # shots to the same scene frame
+        if self.camera is None:
+            return round(mc.sequenceManager(query=True, currentTime=True))  # type: ignore[arg-type]
+        return round(mc.currentTime(query=True))  # type: ignore[arg-type]
+
+
+def visible_anim_curves() -> list[om2.MObject]:
+    """The animation curves upstream of anything that can show up in a
+    playblast: the shapes that aren't hidden, including their transforms,
+    and every camera and light. Shapes hidden by a `visibility` that isn't
+    animated or connected are skipped. The world transforms of DAG nodes
+    depend on their parents, so those are followed too"""
+    roots: list[om2.MObject] = []
+    it_dag = om2.MItDag(om2.MItDag.kDepthFirst, om2.MFn.kShape)
+    while not it_dag.isDone():
+        path = it_dag.getPath()
+        it_dag.next()
+        node = path.node()
+        if (
+            node.hasFn(om2.MFn.kCamera)
+            or node.hasFn(om2.MFn.kLight)
+            or not _statically_hidden(path)
+        ):
+            roots.append(node)
+
+    curves: list[om2.MObject] = []
+    visited: set[int] = set()
+    while roots:
+        it = om2.MItDependencyGraph(
+            roots.pop(),
+            om2.MFn.kInvalid,
+            om2.MItDependencyGraph.kUpstream,
+            om2.MItDependencyGraph.kDepthFirst,
+            om2.MItDependencyGraph.kNodeLevel,
+        )
+        while not it.isDone():
+            node = it.currentNode()
+            key = om2.MObjectHandle(node).hashCode()
+            if key in visited:
+                it.prune()
+                it.next()
+                continue
+            visited.add(key)
+
+            if node.hasFn(om2.MFn.kAnimCurve):
+                curves.append(node)
+            elif node.hasFn(om2.MFn.kDagNode):
+                fn = om2.MFnDagNode(node)
+                roots += [fn.parent(i) for i in range(fn.parentCount())]
+            it.next()
+
+    # keep the hash stable between runs
+    curves.sort(key=lambda curve: om2.MFnDependencyNode(curve).name())
+    return curves
+
+
+def _statically_hidden(path: om2.MDagPath) -> bool:
+    """Whether the node at `path` is an intermediate object, or it or one
+    of its parents has a `visibility` that is off and not connected"""
+    path = om2.MDagPath(path)
+    if om2.MFnDagNode(path).isIntermediateObject:
+        return True
+    while path.length():
+        plug = om2.MFnDagNode(path).findPlug("visibility", False)
+        if not plug.asBool() and not plug.isDestination:
+            return True
+        path.pop()
+    return False
 
 
 @contextmanager
 def applied_hud(
-    builtin_huds: list[str], custom_huds: list[HudDefinition]
+    builtin_huds: list[str],
+    custom_huds: list[HudDefinition],
+    evaluator: HudEvaluator | None = None,
 ) -> Generator[None, None, None]:
     # hide current huds and store current state
     orig_visibility: dict[str, bool] = {}
@@ -118,7 +430,7 @@ def applied_hud(
             chud.name,
             block=mc.headsUpDisplay(nextFreeBlock=chud.section),  # type: ignore[arg-type]
             blockSize=chud.blockSize,
-            command=chud.command,
+            command=evaluator.command(chud) if evaluator else chud.command,
             label=chud.label,
             labelFontSize=chud.labelFontSize,
             section=chud.section,
@@ -136,6 +448,92 @@ def applied_hud(
             mc.headsUpDisplay(chud.name, remove=True)
 
 
+@contextmanager
+def stream_panel(
+    width: int, height: int, capture_kwargs: dict[str, Any]
+) -> Generator[omui.M3dView, None, None]:
+    """Create a temporary model panel set up like a `capture` call with the
+    same `camera`, `viewport_options`, `viewport2_options`, `camera_options`
+    and `display_options`. Yields its view, sized to exactly `width` x
+    `height`"""
+    window = mc.window(width=width, height=height, sizeable=False)
+    mc.paneLayout()
+    panel = mc.modelPanel(menuBarVisible=False)
+    mc.modelEditor(
+        panel,
+        edit=True,
+        allObjects=True,
+        displayAppearance="smoothShaded",
+        grid=False,
+        hud=True,
+        rendererName="vp2Renderer",
+        **capture_kwargs.get("viewport_options", {}),
+    )
+    if camera := capture_kwargs.get("camera"):
+        mc.modelPanel(panel, edit=True, camera=camera)
+
+    orig_vp2: dict[str, Any] = {}
+    for attr, value in capture_kwargs.get("viewport2_options", {}).items():
+        plug = f"hardwareRenderingGlobals.{attr}"
+        orig_vp2[plug] = mc.getAttr(plug)
+        mc.setAttr(plug, value)
+
+    # capture's defaults: no gates or overscan, its background colors
+    orig_camera: dict[str, Any] = {}
+    panel_camera = mc.modelPanel(panel, query=True, camera=True)
+    for attr, value in {
+        **CameraOptions,
+        **capture_kwargs.get("camera_options", {}),
+    }.items():
+        plug = f"{panel_camera}.{attr}"
+        try:
+            orig_camera[plug] = mc.getAttr(plug)
+        except ValueError:
+            # not on this version of Maya
+            continue
+        mc.setAttr(plug, value)
+
+    display_options = {**DisplayOptions, **capture_kwargs.get("display_options", {})}
+    orig_colors = {
+        color: mc.displayRGBColor(color, query=True)
+        for color in ("background", "backgroundTop", "backgroundBottom")
+    }
+    orig_gradient = mc.displayPref(query=True, displayGradient=True)
+    for color in orig_colors:
+        mc.displayRGBColor(color, *display_options[color])
+    mc.displayPref(displayGradient=display_options["displayGradient"])
+
+    orig_time = mc.currentTime(query=True)
+    mc.showWindow(window)
+    try:
+        view = omui.M3dView()
+        omui.M3dView.getM3dViewFromModelPanel(panel, view)
+        # the window's size includes its layout margins. Grow it by whatever
+        # the viewport is short of
+        for _ in range(2):
+            dw, dh = width - view.portWidth(), height - view.portHeight()
+            if not (dw or dh):
+                break
+            window_size = mc.window(window, query=True, widthHeight=True)
+            mc.window(
+                window,
+                edit=True,
+                widthHeight=(window_size[0] + dw, window_size[1] + dh),  # type: ignore[index]
+            )
+            mc.refresh(force=True)
+        yield view
+    finally:
+        mc.currentTime(orig_time)
+        for plug, value in orig_vp2.items():
+            mc.setAttr(plug, value)
+        for plug, value in orig_camera.items():
+            mc.setAttr(plug, value)
+        for color, rgb in orig_colors.items():
+            mc.displayRGBColor(color, *rgb)
+        mc.displayPref(displayGradient=orig_gradient)
+        mc.deleteUI(window)
+
+
 @contextmanager
 def unselect_all() -> Generator[None, None, None]:
     selection = mc.ls(selection=True, long=True, ufeObjects=True, absoluteName=True)
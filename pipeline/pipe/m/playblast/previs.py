@@ -94,6 +94,35 @@ class PrevisPlayblastDialog(PlayblastDialog):
             pass
         return "No shot data"
 
+    def _precompute_shot_lookup(
+        self, frames: range, camera: str | None
+    ) -> dict[int, str]:
+        """Map each frame to its shot name up front so the shot HUD doesn't
+        query the capture panel on every refresh. `frames` are in sequence
+        time when `camera` is None"""
+        if camera is not None:
+            shot = self._camera_shot_lookup.get(camera.split("|").pop())
+            return {frame: shot for frame in frames} if shot else {}
+
+        # the sequencer shows the shot on the highest track, so let those
+        # overwrite the lower ones
+        nodes = sorted(
+            (
+                node
+                for node in mc.sequenceManager(listShots=True) or []  # type: ignore[union-attr]
+                if not mc.shot(node, query=True, mute=True)
+            ),
+            key=lambda node: mc.shot(node, query=True, track=True),  # type: ignore[arg-type,return-value]
+        )
+        lookup: dict[int, str] = {}
+        for node in nodes:
+            name = str(mc.shot(node, query=True, shotName=True))
+            start = round(mc.shot(node, query=True, sequenceStartTime=True))  # type: ignore[arg-type]
+            end = round(mc.shot(node, query=True, sequenceEndTime=True))  # type: ignore[arg-type]
+            for frame in range(max(start, frames.start), min(end + 1, frames.stop)):
+                lookup[frame] = name
+        return lookup
+
     def _save_locations_to_paths(
         self, dialog_id: str, locs: Iterable[SaveLocation], filename: str
     ) -> dict[Playblaster.PRESET, list[str | Path]]:
@@ -131,6 +160,7 @@ class PrevisPlayblastDialog(PlayblastDialog):
                 HudDefinition(
                     "LnDshot",
                     command=self._do_camera_shot_lookup,
+                    precompute=self._precompute_shot_lookup,
                     section=7,
                     idle_refresh=True,
                 ),
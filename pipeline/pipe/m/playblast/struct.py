@@ -50,6 +50,11 @@ class HudDefinition:
         blockSize: Literal["small", "large"]
             Amount of HUD space to occupy
         labelFontSize: Literal["small", "large"]
+        precompute: Callable[[range, str | None], dict[int, str]] | None
+            Called with the frame range and camera (None when playblasting
+            from the sequencer) before each shot is captured. Returns the
+            HUD's value for each frame so `command` doesn't have to run
+            during the capture
     """
 
     name: str
@@ -60,6 +65,7 @@ class HudDefinition:
     idle_refresh: bool = False
     blockSize: Literal["small", "large"] = "small"
     labelFontSize: Literal["small", "large"] = "small"
+    precompute: Callable[[range, str | None], dict[int, str]] | None = None
 
 
 @dataclass
@@ -116,12 +122,21 @@ class MPlayblastConfig:
             List of valid Maya builtin HUD names
         custom_huds: list[HudDefinition]
             List of `HudDefinition`s
+        frame_cache: bool = False
+            Keep captured frames between playblasts and only capture the
+            frames whose animation changed. Ignored when streaming
+        hud_profiler: Callable[[str, float, float], None] | None = None
+            Called with the HUD name, frame and seconds spent every time a
+            custom HUD is evaluated during the playblast
         lighting: bool
             Toggle viewport lighting
         shadows: bool
             Toggle viewport shadows
         shots: list[MShotPlayblastConfig]
             List of shots to playblast
+        stream: bool = False
+            Pipe frames straight to FFmpeg instead of writing temporary PNGs.
+            Shots that use the sequencer are always written to PNGs
     """
 
     builtin_huds: list[str]
@@ -129,6 +144,9 @@ class MPlayblastConfig:
     lighting: bool
     shadows: bool
     shots: list[MShotPlayblastConfig]
+    stream: bool = False
+    frame_cache: bool = False
+    hud_profiler: Callable[[str, float, float], None] | None = None
 
 
 class SaveLocation:
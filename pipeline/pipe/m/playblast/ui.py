@@ -42,18 +42,21 @@ class PlayblastDialog(QtWidgets.QMainWindow, ButtonPair):
     _enabled_locs: dict[str, dict[str, bool]]
     _enabled_checkboxes: dict[str, QCheckBox]
     _main_layout: QtWidgets.QLayout
+    _final_quality: QCheckBox
+    _use_frame_cache: QCheckBox
     _use_lighting: QCheckBox
     _use_shadows: QCheckBox
+    _use_streaming: QCheckBox
 
     playblaster = MPlayblaster()
     shot_configs: list[MShotDialogConfig]
 
     class SAVE_LOCS:
-        CUSTOM = SaveLocation("Custom Folder", "", Playblaster.PRESET.WEB)
+        CUSTOM = SaveLocation("Custom Folder", "", Playblaster.PRESET.WEB_DAILIES)
         CURRENT = SaveLocation(
             "Current Folder",
             Path(mc.file(query=True, sceneName=True)).parent,  # type: ignore[arg-type]
-            Playblaster.PRESET.WEB,
+            Playblaster.PRESET.WEB_DAILIES,
         )
 
     def __init__(
@@ -137,6 +140,26 @@ class PlayblastDialog(QtWidgets.QMainWindow, ButtonPair):
         toggles_layout.addWidget(self._use_lighting)
         self._use_shadows = QCheckBox("Use Shadows")
         toggles_layout.addWidget(self._use_shadows)
+        self._use_streaming = QCheckBox("Stream Frames")
+        self._use_streaming.setToolTip(
+            "Send frames straight to FFmpeg instead of saving temporary images"
+        )
+        toggles_layout.addWidget(self._use_streaming)
+        self._use_frame_cache = QCheckBox("Reuse Unchanged Frames")
+        self._use_frame_cache.setToolTip(
+            "Only capture frames whose animation changed since the last "
+            "playblast. Turn off after editing anything that isn't keyed"
+        )
+        self._use_streaming.toggled.connect(
+            lambda checked: self._use_frame_cache.setEnabled(not checked)
+        )
+        toggles_layout.addWidget(self._use_frame_cache)
+        self._final_quality = QCheckBox("Final Quality")
+        self._final_quality.setToolTip(
+            "Encode web videos at the slow, final deliverable quality instead "
+            "of the quick dailies quality"
+        )
+        toggles_layout.addWidget(self._final_quality)
         self._main_layout.addWidget(toggles_widget)
 
         # custom folder prompt
@@ -177,6 +200,30 @@ class PlayblastDialog(QtWidgets.QMainWindow, ButtonPair):
     def use_shadows(self) -> bool:
         return self._use_shadows.isChecked()
 
+    @property
+    def use_streaming(self) -> bool:
+        return self._use_streaming.isChecked()
+
+    @property
+    def use_frame_cache(self) -> bool:
+        return self._use_frame_cache.isChecked()
+
+    @property
+    def final_quality(self) -> bool:
+        return self._final_quality.isChecked()
+
+    @staticmethod
+    def _final_paths(
+        paths: dict[Playblaster.PRESET, list[str | Path]],
+    ) -> dict[Playblaster.PRESET, list[str | Path]]:
+        """Swap dailies encodes for their final quality preset"""
+        final: dict[Playblaster.PRESET, list[str | Path]] = defaultdict(list)
+        for preset, preset_paths in paths.items():
+            if preset is Playblaster.PRESET.WEB_DAILIES:
+                preset = Playblaster.PRESET.WEB
+            final[preset] += preset_paths
+        return final
+
     def _set_custom_folder(self) -> None:
         """Prompt user to select a custom folder for saving"""
         path_list = mc.fileDialog2(
@@ -202,7 +249,30 @@ class PlayblastDialog(QtWidgets.QMainWindow, ButtonPair):
         return self._enabled_locs[dialog_id][loc_name]
 
     def do_export(self):
-        self.playblaster.configure(self._generate_config()).playblast()
-
-        MessageDialog(self.parent(), "Playblast(s) successful!").exec_()
+        config = self._generate_config()
+        config.stream = self.use_streaming
+        config.frame_cache = self.use_frame_cache
+        if self.final_quality:
+            for shot_config in config.shots:
+                shot_config.set_paths(self._final_paths(shot_config.paths))
+        results = self.playblaster.configure(config).playblast()
+
+        report = "\n".join(
+            f"{r.shot}: captured in {r.capture_time:.0f}s, "
+            f"encoded in {r.encode_time:.0f}s"
+            if r.ok
+            else f"{r.shot}: FAILED ({r.error})"
+            for r in results
+        )
+        if all(r.ok for r in results):
+            MessageDialog(
+                self.parent(), f"Playblast(s) successful!\n\n{report}"
+            ).exec_()
+        else:
+            MessageDialog(
+                self.parent(),
+                "Some playblasts failed. Check the script editor for details."
+                f"\n\n{report}",
+                "Playblast Error",
+            ).exec_()
         self.close()
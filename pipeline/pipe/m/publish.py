@@ -1,28 +1,67 @@
 from __future__ import annotations
 
+import ctypes
+import getpass
+import hashlib
+import json
 import logging
 import os
 import platform
 import shutil
+from datetime import datetime
 from functools import wraps
 from pathlib import Path
 
+import maya.api.OpenMaya as om2
 import maya.cmds as mc
+import maya.OpenMaya as om
+import numpy as np
+
+from pxr import Sdf
 
 import pipe
 from pipe.db import DB
 from pipe.glui.dialogs import FilteredListDialog, MessageDialog
+from pipe.m.publishqueue import PublishQueue
 from pipe.struct.db import SGEntity
+from pipe.util.fileops import (
+    file_digest,
+    file_lock,
+    link_or_copy,
+    write_json_atomic,
+)
 from env_sg import DB_Config
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
     from typing import Any
+
     from Qt.QtWidgets import QWidget
 
 log = logging.getLogger(__name__)
 
+# where the publish history is kept, next to the published file
+VERSIONS_DIR = "versions"
+# versions kept on disk by each publish. Older ones stay in the history
+VERSIONS_KEPT = 20
+
+# transform attributes that end up as xformOps in a USD export
+_XFORM_ATTRS = (
+    "translate",
+    "rotate",
+    "scale",
+    "shear",
+    "rotateOrder",
+    "rotateAxis",
+    "rotatePivot",
+    "rotatePivotTranslate",
+    "scalePivot",
+    "scalePivotTranslate",
+    "inheritsTransform",
+)
+
 
 class Publisher:
     """Class for publishing USDs out of Maya"""
@@ -91,6 +130,15 @@ class Publisher:
         """A dictionary of additional arguments to `mc.mayaUSDExport`"""
         return {}
 
+    def _is_incremental(self) -> bool:
+        """Whether to publish each top level transform to its own sublayer
+        and only export the ones that changed"""
+        return False
+
+    def _is_background(self) -> bool:
+        """Whether to export in a mayapy process instead of this session"""
+        return False
+
     def _get_confirm_message(self) -> str:
         return f"The selected objects have been exported to {self._publish_path}"
 
@@ -107,6 +155,8 @@ class Publisher:
           - `get_save_path(self) -> Path`
           - `presave(self)`
           - `get_mayausd_kwargs(self) -> dict[str, Any]`
+          - `is_incremental(self) -> bool`
+          - `is_background(self) -> bool`
         """
         if not self._prepublish():
             return
@@ -156,21 +206,21 @@ class Publisher:
             return
 
         self._publish_path.parent.mkdir(parents=True, exist_ok=True)
-        temp_publish_path = os.getenv("TEMP", "") + os.pathsep + self._publish_path.name
 
         kwargs = {
-            "file": str(temp_publish_path if self._IS_WINDOWS else self._publish_path),
             "selection": True,
             "stripNamespaces": True,
             **self._get_mayausd_kwargs(),
         }
 
-        mc.mayaUSDExport(**kwargs)  # type: ignore[attr-defined]
+        if self._is_background():
+            # the queue panel reports when it's done
+            PublishQueue.get(self._window).submit(
+                self._publish_path, kwargs, self._is_incremental()
+            )
+            return
 
-        # if on Windows, work around this bug: https://github.com/PixarAnimationStudios/OpenUSD/issues/849
-        # TODO: check if this is still needed in Maya 2025
-        if self._IS_WINDOWS:
-            shutil.move(temp_publish_path, self._publish_path)
+        publish_usd(self._publish_path, kwargs, self._is_incremental())
 
         confirm = MessageDialog(
             self._window,
@@ -178,3 +228,346 @@ class Publisher:
             "Export Complete",
         )
         confirm.exec_()
+
+
+def publish_usd(
+    path: Path,
+    kwargs: dict[str, Any],
+    incremental: bool = False,
+    progress: Callable[[int, int], None] | None = None,
+) -> dict[str, Any]:
+    """Export the selection as a new version of `path`. Returns the
+    version's entry in the history"""
+    if incremental:
+        return publish_incremental(path, kwargs, progress)
+    return publish_versioned(path, lambda dest: export_usd(dest, kwargs))
+
+
+def publish_versioned(
+    path: Path, write: Callable[[Path], None], relink: bool = True, **info: Any
+) -> dict[str, Any]:
+    """Call `write` to write a temporary file, and move it into place as the
+    next version, `versions/<stem>.vNNN.usd`. Then point `path` at it,
+    updating `<stem>.latest` last so readers can poll that small file
+    instead of the USD.
+
+    The version, hash, size, user and time are added to the history in
+    `<stem>.versions.json`, along with any extra `info`. `path` is a link to
+    the version if `relink`, otherwise it's written again with `write`. If
+    nothing changed since the last version, no new version is made and the
+    last one is returned. Only the last `VERSIONS_KEPT` versions are kept"""
+    versions_dir = path.parent / VERSIONS_DIR
+    versions_dir.mkdir(parents=True, exist_ok=True)
+    # keep the extension so USD knows the format
+    tmp = (
+        versions_dir / f".{path.stem}.{os.getpid()}.{os.urandom(4).hex()}{path.suffix}"
+    )
+    try:
+        write(tmp)
+        digest = file_digest(tmp)
+
+        index_path = _versions_index(path)
+        with file_lock(index_path):
+            history = read_versions(path)
+            if history and history[-1]["hash"] == digest:
+                log.info(
+                    f"{path.name} is unchanged since v{history[-1]['version']:03d}"
+                )
+                return history[-1]
+
+            version = history[-1]["version"] + 1 if history else 1
+            versioned = versions_dir / f"{path.stem}.v{version:03d}{path.suffix}"
+            os.replace(tmp, versioned)
+            entry = {
+                "version": version,
+                "file": f"{VERSIONS_DIR}/{versioned.name}",
+                "hash": digest,
+                "size": versioned.stat().st_size,
+                "user": getpass.getuser(),
+                "time": datetime.now().isoformat(timespec="seconds"),
+                **info,
+            }
+            history.append(entry)
+            _prune_versions(path, history, VERSIONS_KEPT)
+            write_json_atomic(index_path, {"versions": history})
+
+            if relink:
+                link_or_copy(versioned, path)
+            else:
+                stable = path.with_name(f".{path.stem}.{os.getpid()}{path.suffix}")
+                write(stable)
+                os.replace(stable, path)
+            write_json_atomic(path.with_name(path.stem + ".latest"), entry)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    log.info(f"Published {path.name} v{version:03d}")
+    return entry
+
+
+def read_versions(path: Path) -> list[dict[str, Any]]:
+    """The publish history of `path`, oldest first"""
+    try:
+        return json.loads(_versions_index(path).read_text())["versions"]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def prune_versions(path: Path, keep: int = VERSIONS_KEPT) -> list[Path]:
+    """Delete the files of all but the last `keep` versions of `path`. Their
+    entries stay in the history, marked as pruned. Returns the deleted
+    files"""
+    with file_lock(_versions_index(path)):
+        history = read_versions(path)
+        removed = _prune_versions(path, history, keep)
+        if removed:
+            write_json_atomic(_versions_index(path), {"versions": history})
+    return removed
+
+
+def _prune_versions(path: Path, history: list[dict[str, Any]], keep: int) -> list[Path]:
+    """Delete the files of the versions before the last `keep` and mark
+    their entries in `history` as pruned. Must hold the history's lock"""
+    removed = []
+    # the last version is what `path` points to
+    for entry in history[: -max(keep, 1)]:
+        if entry.get("pruned"):
+            continue
+        versioned = path.parent / entry["file"]
+        try:
+            versioned.unlink(missing_ok=True)
+        except OSError as e:
+            log.warning(f"Could not prune {versioned}: {e}")
+            continue
+        entry["pruned"] = True
+        removed.append(versioned)
+    if removed:
+        log.info(f"Pruned {len(removed)} old versions of {path.name}")
+    return removed
+
+
+def _versions_index(path: Path) -> Path:
+    return path.with_name(path.stem + ".versions.json")
+
+
+def export_usd(path: Path, kwargs: dict[str, Any]) -> None:
+    """Export the selection to `path`, accounting for the USD export bug
+    on Windows"""
+    is_windows = platform.system() == "Windows"
+    temp_path = os.getenv("TEMP", "") + os.pathsep + path.name
+
+    mc.mayaUSDExport(  # type: ignore[attr-defined]
+        file=str(temp_path if is_windows else path), **kwargs
+    )
+
+    # if on Windows, work around this bug: https://github.com/PixarAnimationStudios/OpenUSD/issues/849
+    # TODO: check if this is still needed in Maya 2025
+    if is_windows:
+        shutil.move(temp_path, path)
+
+
+def publish_incremental(
+    path: Path,
+    kwargs: dict[str, Any],
+    progress: Callable[[int, int], None] | None = None,
+) -> dict[str, Any]:
+    """Export each top level transform of the selection to a sublayer in
+    `<name>_layers/` named by a hash of its contents, and publish a root
+    layer that sublayers them as a new version of `path`. Parts whose hash matches the last
+    publish aren't exported again. `progress` is called with the number of
+    parts done and the total"""
+    layers_dir = path.with_name(path.stem + "_layers")
+    layers_dir.mkdir(exist_ok=True)
+    index_path = layers_dir / "index.json"
+    last: dict[str, dict[str, str]]
+    try:
+        last = json.loads(index_path.read_text())["parts"]
+    except (OSError, ValueError, KeyError):
+        last = {}
+
+    # changing the export settings has to export everything again
+    salt = json.dumps(kwargs, sort_keys=True, default=str).encode()
+    # parts usually share materials
+    shading: dict[str, bytes] = {}
+    parts: dict[str, dict[str, str]] = {}
+    selection: list[str] = mc.ls(selection=True, long=True)  # type: ignore[assignment]
+    nodes = _top_level_transforms(selection)
+    try:
+        for i, node in enumerate(nodes):
+            if progress:
+                progress(i, len(nodes))
+            name = "_".join(n.split(":")[-1] for n in node.strip("|").split("|"))
+            digest = _hash_dag(node, salt, shading)
+            prev = last.get(name)
+            if (
+                digest
+                and prev
+                and prev["hash"] == digest
+                and (layers_dir / prev["file"]).exists()
+            ):
+                log.info(f"{name} is unchanged, skipping export")
+                parts[name] = prev
+                continue
+
+            log.info(f"Exporting {name}")
+            filename = f"{name}.{(digest or os.urandom(20).hex())[:12]}.usd"
+            mc.select(node, replace=True)
+            export_usd(layers_dir / filename, kwargs)
+            parts[name] = {"hash": digest or "", "file": filename}
+    finally:
+        mc.select(selection, replace=True)
+
+    sublayers = [layers_dir / part["file"] for part in parts.values()]
+    # the sublayer paths are relative, so `path` can't be a link to the version
+    entry = publish_versioned(
+        path,
+        lambda dest: _write_root_layer(dest, sublayers),
+        relink=False,
+        parts=[part["file"] for part in parts.values()],
+    )
+    write_json_atomic(index_path, {"parts": parts})
+
+    # keep the parts of every version still on disk
+    used = {
+        file
+        for v in read_versions(path)
+        if not v.get("pruned")
+        for file in v.get("parts", [])
+    }
+    used.update(entry.get("parts", []))
+    for old in layers_dir.glob("*.usd"):
+        if old.name not in used:
+            old.unlink(missing_ok=True)
+    if progress:
+        progress(len(nodes), len(nodes))
+    return entry
+
+
+def _top_level_transforms(selection: list[str]) -> list[str]:
+    """The transforms to publish as separate parts. If a single group is
+    selected its children are used, going down until there's more than one"""
+    nodes = selection
+    while len(nodes) == 1:
+        children: list[str] = (
+            mc.listRelatives(nodes[0], children=True, fullPath=True) or []  # type: ignore[assignment]
+        )
+        if not children or mc.ls(children, shapes=True):
+            break
+        nodes = children
+    return nodes
+
+
+def _hash_dag(
+    node: str, salt: bytes, shading: dict[str, bytes] | None = None
+) -> str | None:
+    """Hash of what ends up in the USD export of `node`: the hierarchy,
+    transforms, mesh points, topology, UVs, normals, shader assignments and
+    the shading networks they use. `shading` caches the digests of shading
+    networks between calls. Returns None if there are shapes other than
+    meshes, so the part is always exported"""
+    if shading is None:
+        shading = {}
+    digest = hashlib.sha1(salt)
+
+    # the parents are exported too
+    names = node.split("|")
+    for i in range(2, len(names)):
+        parent = "|".join(names[:i])
+        digest.update(parent.encode())
+        for attr in _XFORM_ATTRS:
+            digest.update(repr(mc.getAttr(f"{parent}.{attr}")).encode())
+
+    sel = om2.MSelectionList()
+    sel.add(node)
+    it = om2.MItDag()
+    it.reset(sel.getDagPath(0))
+    while not it.isDone():
+        obj = it.currentItem()
+        path = it.getPath()
+        it.next()
+        if om2.MFnDagNode(obj).isIntermediateObject:
+            continue
+        name = path.fullPathName()
+        digest.update(name.encode())
+        digest.update(repr(mc.getAttr(name + ".visibility")).encode())
+
+        if obj.hasFn(om2.MFn.kMesh):
+            mesh = om2.MFnMesh(path)
+            counts, connects = mesh.getVertices()
+            us, vs = mesh.getUVs()
+            shaders, indices = mesh.getConnectedShaders(path.instanceNumber())
+            for data in (
+                _raw_points(name, mesh.numVertices),
+                np.array(counts, dtype=np.int32),
+                np.array(connects, dtype=np.int32),
+                np.array(us, dtype=np.float32),
+                np.array(vs, dtype=np.float32),
+                np.array(mesh.getNormals(), dtype=np.float32),
+                np.array(indices, dtype=np.int32),
+            ):
+                digest.update(data.tobytes())
+            for i in range(len(shaders)):
+                shading_group = om2.MFnDependencyNode(shaders[i]).name()
+                digest.update(shading_group.encode())
+                if shading_group not in shading:
+                    shading[shading_group] = _hash_shading_network(shading_group)
+                digest.update(shading[shading_group])
+        elif obj.hasFn(om2.MFn.kTransform):
+            for attr in _XFORM_ATTRS:
+                digest.update(repr(mc.getAttr(f"{name}.{attr}")).encode())
+        else:
+            return None
+
+    return digest.hexdigest()
+
+
+def _hash_shading_network(shading_group: str) -> bytes:
+    """Digest of every node upstream of `shading_group`: their types, how
+    they're connected and the values of their writable attributes, which
+    include the texture paths"""
+    digest = hashlib.sha1()
+    for node in sorted(mc.listHistory(shading_group, pruneDagObjects=True) or []):
+        digest.update(f"{node} {mc.nodeType(node)}".encode())
+        connections = mc.listConnections(
+            node, source=True, destination=False, plugs=True, connections=True
+        )
+        digest.update(repr(connections).encode())
+        for attr in mc.listAttr(node, write=True, hasData=True, multi=True) or []:
+            try:
+                value = mc.getAttr(f"{node}.{attr}")
+            except (RuntimeError, ValueError):
+                # some attributes can't be read on their own
+                continue
+            digest.update(f"{attr}={value!r}".encode())
+    return digest.digest()
+
+
+def _raw_points(mesh: str, count: int) -> np.ndarray:
+    """The object space points of `mesh` without copying them one by one"""
+    sel = om.MSelectionList()
+    sel.add(mesh)
+    dag_path = om.MDagPath()
+    sel.getDagPath(0, dag_path)
+    ptr = om.MFnMesh(dag_path).getRawPoints()
+    points = ctypes.cast(int(ptr), ctypes.POINTER(ctypes.c_float))
+    return np.ctypeslib.as_array(points, shape=(count * 3,)).copy()
+
+
+def _write_root_layer(path: Path, sublayers: list[Path]) -> None:
+    """Atomically write `path` as a layer made of `sublayers`, with the
+    stage metadata of the first one. The sublayers are referred to relative
+    to `path`"""
+    layer = Sdf.Layer.CreateAnonymous(path.suffix)
+    layer.subLayerPaths = [
+        rel if rel.startswith("../") else f"./{rel}"
+        for rel in (Path(os.path.relpath(s, path.parent)).as_posix() for s in sublayers)
+    ]
+    if sublayers and (first := Sdf.Layer.FindOrOpen(str(sublayers[0]))):
+        for key in ("defaultPrim", "upAxis", "metersPerUnit"):
+            if first.pseudoRoot.HasInfo(key):
+                layer.pseudoRoot.SetInfo(key, first.pseudoRoot.GetInfo(key))
+
+    # keep the extension so USD knows the format
+    tmp = path.with_name(f".{path.stem}.{os.getpid()}{path.suffix}")
+    layer.Export(str(tmp))
+    os.replace(tmp, path)
@@ -0,0 +1,284 @@
+"""Background USD publishing.
+
+`PublishQueue.submit` saves a copy of the selection and exports it in a
+mayapy process, so the artist can keep working. The queue is shown in a
+small panel that tracks each publish's progress and notifies when it's
+done. The worker side runs as:
+
+    mayapy -c <bootstrap> --worker /tmp/lnd_publish_XXXX/job.json"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from env import Executables
+from Qt import QtCore, QtWidgets
+from shared.util import mayapy_command
+
+from pipe.util import silent_startupinfo
+from pipe.util.fileops import write_json_atomic
+
+if TYPE_CHECKING:
+    import typing
+
+log = logging.getLogger(__name__)
+
+MODULE = "pipe.m.publishqueue"
+STATUS_FILE = "status.json"
+LOG_FILE = "publish.log"
+
+# Maya has to be initialized before the publish modules are imported
+_WORKER_BOOTSTRAP = mayapy_command(
+    "import runpy",
+    f"runpy.run_module({MODULE!r}, run_name='__main__', alter_sys=True)",
+)
+
+
+@dataclass
+class PublishJob:
+    """A publish running in a mayapy process and its row in the panel"""
+
+    path: Path
+    job_dir: Path
+    proc: subprocess.Popen
+    item: QtWidgets.QTreeWidgetItem
+    progress: QtWidgets.QProgressBar
+    start: float = field(default_factory=time.time)
+    finished: bool = False
+
+
+class PublishQueue(QtWidgets.QDialog):
+    """Panel listing the background publishes. A timer polls the workers'
+    status files while any are running"""
+
+    POLL_INTERVAL = 500  # ms
+
+    _instance: PublishQueue | None = None
+
+    _jobs: list[PublishJob]
+    _timer: QtCore.QTimer
+    _tree: QtWidgets.QTreeWidget
+
+    @classmethod
+    def get(cls, parent: QtWidgets.QWidget | None = None) -> PublishQueue:
+        if cls._instance is None:
+            cls._instance = cls(parent)
+        return cls._instance
+
+    def __init__(self, parent: QtWidgets.QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Publish Queue")
+        self.setMinimumWidth(500)
+        self.setModal(False)
+        self._jobs = []
+
+        self._tree = QtWidgets.QTreeWidget()
+        self._tree.setHeaderLabels(["Publish", "Status", "Progress"])
+        self._tree.setRootIsDecorated(False)
+
+        clear_btn = QtWidgets.QPushButton("Clear Finished")
+        clear_btn.clicked.connect(self._clear_finished)
+        buttons_layout = QtWidgets.QHBoxLayout()
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(clear_btn)
+
+        main_layout = QtWidgets.QVBoxLayout(self)
+        main_layout.addWidget(self._tree)
+        main_layout.addLayout(buttons_layout)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(self.POLL_INTERVAL)
+        self._timer.timeout.connect(self._poll)
+
+    def submit(
+        self, path: Path, kwargs: dict[str, typing.Any], incremental: bool = False
+    ) -> PublishJob:
+        """Save the selection to a temporary scene and start a mayapy process
+        that exports it to `path` with `mc.mayaUSDExport(**kwargs)`"""
+        import maya.cmds as mc
+
+        job_dir = Path(tempfile.mkdtemp(prefix="lnd_publish_"))
+        scene = job_dir / "selection.mb"
+        selection: list[str] = mc.ls(selection=True, long=True)  # type: ignore[assignment]
+        # import references so the copy doesn't depend on the session
+        mc.file(
+            str(scene),
+            exportSelected=True,
+            preserveReferences=False,
+            type="mayaBinary",
+            force=True,
+        )
+
+        job_path = job_dir / "job.json"
+        job_path.write_text(
+            json.dumps(
+                {
+                    "scene": str(scene),
+                    "selection": selection,
+                    "path": str(path),
+                    "kwargs": kwargs,
+                    "incremental": incremental,
+                },
+                indent=4,
+            )
+        )
+
+        # fmt: off
+        cmd = [
+            str(Executables.mayapy), "-c", _WORKER_BOOTSTRAP,
+            "--worker", str(job_path),
+        ]
+        # fmt: on
+        with open(job_dir / LOG_FILE, "w") as log_file:
+            proc = subprocess.Popen(
+                cmd,
+                env=os.environ,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                startupinfo=silent_startupinfo(),
+            )
+        log.info(f"Publishing {path} in the background (pid {proc.pid})")
+
+        item = QtWidgets.QTreeWidgetItem([path.name, "Starting"])
+        item.setToolTip(0, str(path))
+        self._tree.addTopLevelItem(item)
+        progress = QtWidgets.QProgressBar()
+        # busy until the worker reports a part count
+        progress.setRange(0, 0)
+        self._tree.setItemWidget(item, 2, progress)
+
+        job = PublishJob(path, job_dir, proc, item, progress)
+        self._jobs.append(job)
+        self._timer.start()
+        self.show()
+        return job
+
+    def _poll(self) -> None:
+        running = False
+        for job in self._jobs:
+            if job.finished:
+                continue
+            status = _read_status(job.job_dir)
+            if status.get("total"):
+                job.progress.setRange(0, status["total"])
+                job.progress.setValue(status["done"])
+
+            returncode = job.proc.poll()
+            if returncode is None:
+                elapsed = time.time() - job.start
+                job.item.setText(
+                    1, f"{status.get('state', 'Starting')} ({elapsed:.0f}s)"
+                )
+                running = True
+            else:
+                self._finish(job, returncode, status)
+
+        if not running:
+            self._timer.stop()
+
+    def _finish(
+        self, job: PublishJob, returncode: int, status: dict[str, typing.Any]
+    ) -> None:
+        import maya.cmds as mc
+
+        job.finished = True
+        job.progress.setRange(0, 1)
+        elapsed = time.time() - job.start
+        # mayapy can crash on exit after the export finished
+        if status.get("state") == "Done":
+            job.progress.setValue(1)
+            job.item.setText(1, f"Done ({elapsed:.0f}s)")
+            message = f"Published {job.path.name}"
+            log.info(f"{message} in {elapsed:.0f}s")
+            shutil.rmtree(job.job_dir, ignore_errors=True)
+        else:
+            # keep the log and scene copy around to debug
+            error = status.get("error") or f"mayapy exited with code {returncode}"
+            job.item.setText(1, "Failed")
+            job.item.setToolTip(1, f"{error}\nSee {job.job_dir / LOG_FILE}")
+            message = f"Publishing {job.path.name} failed"
+            log.error(f"{message}: {error}. See {job.job_dir / LOG_FILE}")
+
+        mc.inViewMessage(  # type: ignore[attr-defined]
+            assistMessage=message, position="topCenter", fade=True
+        )
+
+    def _clear_finished(self) -> None:
+        for job in [j for j in self._jobs if j.finished]:
+            self._tree.takeTopLevelItem(self._tree.indexOfTopLevelItem(job.item))
+            self._jobs.remove(job)
+
+
+def _read_status(job_dir: Path) -> dict[str, typing.Any]:
+    try:
+        return json.loads((job_dir / STATUS_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def work(job_path: Path) -> None:
+    """Open the job's scene in this (already initialized) mayapy process and
+    export the selection it was saved with"""
+    import maya.cmds as mc
+
+    from pipe.m.publish import publish_usd
+
+    job = json.loads(job_path.read_text())
+    status_path = job_path.with_name(STATUS_FILE)
+
+    def status(
+        state: str, done: int = 0, total: int = 0, error: str | None = None
+    ) -> None:
+        write_json_atomic(
+            status_path, {"state": state, "done": done, "total": total, "error": error}
+        )
+
+    try:
+        status("Opening")
+        mc.file(job["scene"], open=True, force=True)
+
+        mc.select(clear=True)
+        for node in job["selection"]:
+            # fall back to the short name if the copy lost the node's parents
+            if matches := mc.ls(node, long=True) or mc.ls(
+                node.rsplit("|", 1)[-1], long=True
+            ):
+                mc.select(matches, add=True)
+            else:
+                log.warning(f"{node} is missing from the saved selection")
+
+        status("Exporting")
+        publish_usd(
+            Path(job["path"]),
+            job["kwargs"],
+            job["incremental"],
+            progress=lambda done, total: status("Exporting", done, total),
+        )
+        status("Done")
+    except Exception as e:
+        log.exception(f"Failed to publish {job['path']}")
+        status("Failed", error=str(e))
+        sys.exit(1)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Background USD publish worker")
+    parser.add_argument("--worker", type=Path, required=True, help="Job JSON file")
+    args = parser.parse_args(argv)
+    work(args.worker)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,166 @@
+"""Deferred reference loading for anim shot files.
+
+With lazy references on, new anim files reference their rigs unloaded and
+existing ones open without loading any. Which references are loaded is kept
+in the file's `fileInfo`, so reopening a shot only loads what the animator
+was working with. `ReferenceLoader` loads and unloads them on demand."""
+
+from __future__ import annotations
+
+import logging
+
+import maya.cmds as mc
+from Qt import QtCore, QtWidgets
+
+from pipe.m.local import get_main_qt_window
+
+log = logging.getLogger(__name__)
+
+LAZY_OPTION_VAR = "lnd_lazyReferences"
+LOADED_REFS_KEY = "lndLoadedReferences"
+
+
+def lazy_references() -> bool:
+    """Whether anim files should create and open their references unloaded"""
+    return bool(
+        mc.optionVar(exists=LAZY_OPTION_VAR) and mc.optionVar(query=LAZY_OPTION_VAR)
+    )
+
+
+def set_lazy_references(lazy: bool) -> None:
+    mc.optionVar(intValue=(LAZY_OPTION_VAR, int(lazy)))
+
+
+def reference_nodes() -> list[str]:
+    """The reference nodes of the top level references in the scene"""
+    return [
+        str(mc.referenceQuery(path, referenceNode=True))
+        for path in mc.file(query=True, reference=True) or []
+    ]
+
+
+def save_load_state() -> None:
+    """Record which references are loaded in the scene's `fileInfo`"""
+    loaded = [n for n in reference_nodes() if mc.referenceQuery(n, isLoaded=True)]
+    mc.fileInfo(LOADED_REFS_KEY, ";".join(loaded))
+
+
+def restore_load_state() -> None:
+    """Load the references recorded in `fileInfo` by `save_load_state`. If
+    nothing was recorded, all of them are loaded"""
+    try:
+        recorded = mc.fileInfo(LOADED_REFS_KEY, query=True)[0]
+        loaded: set[str] | None = set(filter(None, recorded.split(";")))
+    except IndexError:
+        loaded = None
+
+    for node in reference_nodes():
+        if (loaded is None or node in loaded) and not mc.referenceQuery(
+            node, isLoaded=True
+        ):
+            log.info(f"Loading {node}")
+            mc.file(loadReference=node)
+
+
+class ReferenceLoader(QtWidgets.QDialog):
+    """Panel for loading and unloading the scene's references"""
+
+    _list: QtWidgets.QListWidget
+    _lazy_check: QtWidgets.QCheckBox
+
+    def __init__(self, parent=None):
+        super().__init__(parent or get_main_qt_window())
+
+        self.setWindowTitle("Reference Loader")
+        self.setMinimumWidth(300)
+
+        self.create_widgets()
+        self.create_layouts()
+        self.create_connections()
+        self.refresh()
+
+    def create_widgets(self):
+        self._list = QtWidgets.QListWidget()
+        self._lazy_check = QtWidgets.QCheckBox(
+            "Open anim files with references unloaded"
+        )
+        self._lazy_check.setChecked(lazy_references())
+
+        self.load_all_btn = QtWidgets.QPushButton("Load All")
+        self.unload_all_btn = QtWidgets.QPushButton("Unload All")
+        self.refresh_btn = QtWidgets.QPushButton("Refresh")
+
+    def create_layouts(self):
+        main_layout = QtWidgets.QVBoxLayout(self)
+
+        buttons_layout = QtWidgets.QHBoxLayout()
+        buttons_layout.addWidget(self.load_all_btn)
+        buttons_layout.addWidget(self.unload_all_btn)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(self.refresh_btn)
+
+        main_layout.addWidget(self._list)
+        main_layout.addLayout(buttons_layout)
+        main_layout.addWidget(self._lazy_check)
+
+    def create_connections(self):
+        self._list.itemChanged.connect(self.on_item_changed)
+        self.load_all_btn.clicked.connect(lambda: self.set_all_loaded(True))
+        self.unload_all_btn.clicked.connect(lambda: self.set_all_loaded(False))
+        self.refresh_btn.clicked.connect(self.refresh)
+        self._lazy_check.toggled.connect(set_lazy_references)
+
+    def refresh(self):
+        self._list.blockSignals(True)
+        self._list.clear()
+        for node in reference_nodes():
+            namespace = mc.referenceQuery(node, namespace=True, shortName=True)
+            item = QtWidgets.QListWidgetItem(f"{namespace} ({node})")
+            item.setData(QtCore.Qt.UserRole, node)
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            item.setCheckState(
+                QtCore.Qt.Checked
+                if mc.referenceQuery(node, isLoaded=True)
+                else QtCore.Qt.Unchecked
+            )
+            self._list.addItem(item)
+        self._list.blockSignals(False)
+
+    def on_item_changed(self, item: QtWidgets.QListWidgetItem):
+        self._set_loaded(
+            [item.data(QtCore.Qt.UserRole)], item.checkState() == QtCore.Qt.Checked
+        )
+
+    def set_all_loaded(self, loaded: bool):
+        self._set_loaded(reference_nodes(), loaded)
+        self.refresh()
+
+    def _set_loaded(self, nodes: list[str], loaded: bool):
+        mc.waitCursor(state=True)
+        try:
+            for node in nodes:
+                if bool(mc.referenceQuery(node, isLoaded=True)) == loaded:
+                    continue
+                if loaded:
+                    mc.file(loadReference=node)
+                else:
+                    mc.file(unloadReference=node)
+        finally:
+            mc.waitCursor(state=False)
+        save_load_state()
+
+
+ref_loader: ReferenceLoader | None = None
+
+
+def run():
+    global ref_loader
+    try:
+        assert ref_loader is not None
+        ref_loader.close()
+        ref_loader.deleteLater()
+    except AssertionError:
+        pass
+
+    ref_loader = ReferenceLoader()
+    ref_loader.show()
@@ -1,12 +1,29 @@
 from __future__ import annotations
 
+import getpass
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
 from Qt import QtWidgets
 
 import maya.cmds as mc
-import os
 
 import shared.util as su
 from pipe.m.local import get_main_qt_window
+from pipe.util.fileops import file_lock, write_json_atomic
+
+if TYPE_CHECKING:
+    from typing import Any
+
+log = logging.getLogger(__name__)
+
+# kept in each rig's RigVersions folder
+INDEX_NAME = "index.json"
 
 rig_list = [
     "select rig",
@@ -78,45 +95,37 @@ class RigPublishUI(QtWidgets.QDialog):
 
         dir_path = su.get_rigging_path() / "Rigs" / file_name / "RigVersions"
 
-        # search directory for all versions and determine new version number
-        ls_dir = dir_path.iterdir()
-        latest_version = 0
-
-        for item in ls_dir:
-            try:
-                version = int(str(item).split(".")[-2])
-                if version > latest_version:
-                    latest_version = version
-            except Exception as e:
-                print(f"exception '{e}' for: {item}")
-
-        v_string = str(latest_version + 1).zfill(3)
-
-        # save file to path
-        full_name = dir_path / f"{file_name}.{v_string}.mb"
+        # save under a temporary name. The version is only taken once the
+        # save succeeded, so a failed save doesn't leave a gap
+        scene = mc.file(query=True, sceneName=True)
+        tmp_name = dir_path / f".{file_name}.{os.getpid()}.tmp.mb"
+        try:
+            mc.file(rename=tmp_name)
+            mc.file(s=True, f=True, typ="mayaBinary")
+            version, full_name = record_version(dir_path, file_name, tmp_name)
+        except BaseException:
+            tmp_name.unlink(missing_ok=True)
+            mc.file(rename=scene)
+            raise
         mc.file(rename=full_name)
-        saved = mc.file(s=True, f=True, typ="mayaBinary")
 
-        print(f"File saved to '{saved}'")
+        print(f"File saved to '{full_name}'")
 
         # create symlinks
+        links: dict[str, Path] = {}
         if update_anim:
-            anim_link_dir_path = su.get_anim_path() / "Rigs"
-            temp_name = f"{anim_link_dir_path}\\tmp"
-            os.symlink(full_name, temp_name)
-            os.rename(temp_name, f"{anim_link_dir_path}/{file_name}.mb")
-
-            print(
-                f"Link to file created or updated at '{anim_link_dir_path}/{file_name}.mb'\n"
-            )
+            links["anim"] = su.get_anim_path() / "Rigs" / f"{file_name}.mb"
         if update_pvis:
-            pvis_link_dir_path = su.get_previs_path() / "Rigs"
-            temp_name = f"{pvis_link_dir_path}\\tmp"
-            os.symlink(full_name, temp_name)
-            os.rename(temp_name, f"{pvis_link_dir_path}/{file_name}.mb")
-
-            print(
-                f"Link to file created or updated at '{pvis_link_dir_path}/{file_name}.mb'\n"
+            links["previs"] = su.get_previs_path() / "Rigs" / f"{file_name}.mb"
+        for link in links.values():
+            update_link(link, full_name)
+            print(f"Link to file created or updated at '{link}'\n")
+
+        record_links(dir_path, file_name, version, links)
+        if stale := stale_links(dir_path, file_name):
+            mc.warning(
+                f"These links to {file_name} don't point at the version they "
+                f"were last published to: {', '.join(map(str, stale))}"
             )
         self.close()
 
@@ -125,6 +134,100 @@ class RigPublishUI(QtWidgets.QDialog):
         self.close()
 
 
+def read_index(dir_path: Path, rig: str) -> dict[str, Any]:
+    """The version index of `rig` in its RigVersions folder `dir_path`.
+    Rebuilt from a scan of the folder if it's missing, unreadable or behind
+    the files on disk"""
+    index_path = dir_path / INDEX_NAME
+    try:
+        index = json.loads(index_path.read_text())
+        latest = index["latest"]
+    except (OSError, ValueError, KeyError):
+        log.info(f"Rebuilding the version index of {rig}")
+        return scan_versions(dir_path, rig)
+
+    # versions saved without going through the index
+    if (dir_path / f"{rig}.{str(latest + 1).zfill(3)}.mb").exists():
+        log.warning(f"The version index of {rig} is out of date, rebuilding")
+        return scan_versions(dir_path, rig, index)
+    return index
+
+
+def scan_versions(
+    dir_path: Path, rig: str, index: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """Rebuild the version index of `rig` from the files in `dir_path`,
+    keeping what's known about the versions from `index`"""
+    known = (index or {}).get("versions", {})
+    pattern = re.compile(rf"^{re.escape(rig)}\.(\d+)\.mb$")
+    versions: dict[str, dict[str, Any]] = {}
+    for item in dir_path.iterdir():
+        if match := pattern.match(item.name):
+            v_string = match.group(1)
+            versions[v_string] = known.get(v_string, {"file": item.name})
+    return {
+        "rig": rig,
+        "latest": max((int(v) for v in versions), default=0),
+        "versions": dict(sorted(versions.items())),
+        "links": (index or {}).get("links", {}),
+    }
+
+
+def record_version(dir_path: Path, rig: str, saved: Path) -> tuple[int, Path]:
+    """Move the saved scene `saved` into place as the next version of `rig`
+    and add it to the index. Returns the version and its path"""
+    with file_lock(dir_path / INDEX_NAME):
+        index = read_index(dir_path, rig)
+        version = index["latest"] + 1
+        v_string = str(version).zfill(3)
+        path = dir_path / f"{rig}.{v_string}.mb"
+        os.replace(saved, path)
+
+        index["latest"] = version
+        index["versions"][v_string] = {
+            "file": path.name,
+            "user": getpass.getuser(),
+            "time": datetime.now().isoformat(timespec="seconds"),
+        }
+        write_json_atomic(dir_path / INDEX_NAME, index)
+    return version, path
+
+
+def record_links(
+    dir_path: Path, rig: str, version: int, links: dict[str, Path]
+) -> None:
+    """Add the links now pointing at `version` to the index"""
+    with file_lock(dir_path / INDEX_NAME):
+        index = read_index(dir_path, rig)
+        for name, link in links.items():
+            index["links"][name] = {"path": str(link), "version": version}
+        write_json_atomic(dir_path / INDEX_NAME, index)
+
+
+def stale_links(dir_path: Path, rig: str) -> list[Path]:
+    """The links in the index of `rig` that don't point at the version they
+    were last updated to"""
+    index = read_index(dir_path, rig)
+    stale: list[Path] = []
+    for info in index["links"].values():
+        link = Path(info["path"])
+        version = index["versions"].get(str(info["version"]).zfill(3))
+        try:
+            if not version or Path(os.readlink(link)) != dir_path / version["file"]:
+                stale.append(link)
+        except OSError:
+            stale.append(link)
+    return stale
+
+
+def update_link(link: Path, target: Path) -> None:
+    """Atomically point the symlink `link` at `target`"""
+    tmp = link.with_name(f".{link.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    os.symlink(target, tmp)
+    os.replace(tmp, link)
+
+
 rig_pub: RigPublishUI | None = None
 
 
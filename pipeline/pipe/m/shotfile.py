@@ -6,16 +6,18 @@ import maya.api.OpenMaya as om
 import maya.cmds as mc
 
 from abc import abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from pxr import Sdf, Usd, UsdGeom
 from timeline_marker.ui import TimelineMarker  # type: ignore[import-not-found]
-from typing import cast
+from typing import ClassVar, cast
 
 from pipe.db import DB
 from pipe.glui.dialogs import MessageDialogCustomButtons
+from pipe.m import refloader
 from pipe.m.local import get_main_qt_window
-from pipe.struct.db import SGEntity, Shot
-from pipe.util import FileManager, log_errors
+from pipe.struct.db import Asset, EnvironmentStub, SGEntity, Shot
+from pipe.util import FileManager, log_errors, shotlayers
 from shared.util import get_production_path
 
 from env_sg import DB_Config
@@ -67,9 +69,12 @@ def shot_timeline_generator(
 
 
 class MShotFileManager(FileManager):
-    MAYA_OVERRIDE = "maya_override.usd"
+    MAYA_OVERRIDE = shotlayers.MAYA_OVERRIDE
     shot: Shot
 
+    # shared by every file manager in the session
+    _layer_cache: ClassVar[shotlayers.ShotLayerCache] = shotlayers.ShotLayerCache()
+
     def __init__(self) -> None:
         conn = DB.Get(DB_Config)
         window = get_main_qt_window()
@@ -90,10 +95,8 @@ class MShotFileManager(FileManager):
     def run_on_open(cls) -> None:
         """Function to run on file open via script node"""
 
-        # save edit target layer on save
         beforeSaveId = om.MSceneMessage.addCallback(
-            om.MSceneMessage.kBeforeSave,
-            lambda _: MShotFileManager.get_stage().GetEditTarget().GetLayer().Save(),
+            om.MSceneMessage.kBeforeSave, lambda _: cls._before_save()
         )
 
         # remove callback before opening a new file
@@ -125,6 +128,12 @@ class MShotFileManager(FileManager):
         except Exception:
             mc.error("Warning! Could not set edit target!")
 
+    @classmethod
+    def _before_save(cls) -> None:
+        """Function to run before the scene is saved"""
+        # save edit target layer on save
+        cls.get_stage().GetEditTarget().GetLayer().Save()
+
     @staticmethod
     def _check_unsaved_changes() -> bool:
         if mc.file(query=True, modified=True):
@@ -159,7 +168,7 @@ class MShotFileManager(FileManager):
         classname = self.__class__.__name__
         mc.scriptNode(
             beforeScript=(
-                f"from pipe.m.shotfile import {classname};" f"{classname}.run_on_open()"
+                f"from pipe.m.shotfile import {classname};{classname}.run_on_open()"
             ),
             name=ON_OPEN_SCRIPT,
             scriptType=1,
@@ -168,15 +177,41 @@ class MShotFileManager(FileManager):
         # script node is created, will not run this session, so run manually
         self.run_on_open()
 
-    def _import_camera(self) -> None:
+    @classmethod
+    def clear_layer_cache(cls) -> None:
+        """Forget the layers resolved for each shot this session"""
+        cls._layer_cache.clear()
+
+    def _shot_layers(self) -> shotlayers.ShotLayers:
+        """The camera, override and env layers of the shot, resolved once per
+        session and reloaded if they change on disk. They are resolved again
+        if the shot's env is reassigned"""
         assert self.shot.path is not None
+
+        if not (env_stub := self.shot.set):
+            if not self.shot.sequence:
+                env_stub = None
+            else:
+                env_stub = self._conn.get_sequence_by_stub(self.shot.sequence).set
+
+        def find_env_path(stub: EnvironmentStub) -> str | None:
+            env = self._conn.get_env_by_stub(stub)
+            return env.path if env else None
+
+        return self._layer_cache.get(
+            self.get_stage().GetRootLayer(),
+            self.shot.code,
+            self.shot.path,
+            env_stub,
+            find_env_path,
+        )
+
+    def _import_camera(self) -> None:
         root_layer = self.get_stage().GetRootLayer()
 
         # mc.mayaUsdLayerEditor(cam_layer.identifier, edit=True, lockLayer=(2, 0, stageShape))
 
-        cam_file_layer = Sdf.Layer.FindOrOpenRelativeToLayer(
-            root_layer, "/".join((self.shot.path, "cam", "cam.usd"))
-        )
+        cam_file_layer = self._shot_layers().camera
         if not cam_file_layer:
             mc.warning("No exported camera found")
             return
@@ -184,24 +219,13 @@ class MShotFileManager(FileManager):
         root_layer.subLayerPaths.append(cam_file_layer.identifier)
 
     def _import_env(self) -> None:
-        assert self.shot.path is not None
         stage = self.get_stage()
         root_layer = stage.GetRootLayer()
+        layers = self._shot_layers()
         # locked_layers: list[str] = []
 
         # Set up shot-level overrides
-        env_override_layer = Sdf.Layer.FindOrOpenRelativeToLayer(
-            root_layer,
-            "/".join((self.shot.path, "set", MShotFileManager.MAYA_OVERRIDE)),
-        ) or Sdf.Layer.CreateNew(
-            str(
-                get_production_path()
-                / self.shot.path
-                / "set"
-                / MShotFileManager.MAYA_OVERRIDE
-            )
-        )
-        env_override_layer.Save()
+        env_override_layer = layers.override
         root_layer.subLayerPaths.append(env_override_layer.identifier)
         # Fix env scale
         env_prim = stage.OverridePrim(Sdf.Path("/environment"))
@@ -210,16 +234,7 @@ class MShotFileManager(FileManager):
 
         stage.SetEditTarget(Usd.EditTarget(env_override_layer))
 
-        if not (env_stub := self.shot.set):
-            if not self.shot.sequence:
-                env_stub = None
-            else:
-                env_stub = self._conn.get_sequence_by_stub(self.shot.sequence).set
-
-        if env_stub and (env := self._conn.get_env_by_stub(env_stub)) and env.path:
-            env_file_layer = Sdf.Layer.FindOrOpenRelativeToLayer(
-                root_layer, "/".join((env.path, "main.usd"))
-            )
+        if env_file_layer := layers.env:
             root_layer.subLayerPaths.append(env_file_layer.identifier)
             # locked_layers.append(env_file_layer.identifier)
             env_file_layer.SetPermissionToSave(False)
@@ -278,6 +293,9 @@ class MShotFileManager(FileManager):
 
 
 class MAnimShotFileManager(MShotFileManager):
+    # the checks wait on the network share, not the CPU
+    RIG_CHECK_WORKERS = 16
+
     @classmethod
     def run_on_open(cls):
         super().run_on_open()
@@ -299,24 +317,81 @@ class MAnimShotFileManager(MShotFileManager):
             mc.lookThru(CAM_NAME)
             mc.camera(camera_shape, edit=True, lockTransform=True)
 
+    @classmethod
+    def _before_save(cls) -> None:
+        super()._before_save()
+        # keep the reference load state in fileInfo
+        refloader.save_load_state()
+
     @staticmethod
     def _get_subpath() -> str:
         return "anim"
 
+    @staticmethod
+    def _open_file(path: Path) -> None:
+        if not refloader.lazy_references():
+            MShotFileManager._open_file(path)
+            return
+        # only load what was loaded when the file was last saved
+        mc.file(str(path), open=True, force=True, loadReferenceDepth="none")
+        refloader.restore_load_state()
+
     def _setup_scene(self) -> None:
-        self._import_camera()
-        self._import_env()
+        assets = self._shot_assets()
+        if assets:
+            workers = min(self.RIG_CHECK_WORKERS, len(assets))
+            with ThreadPoolExecutor(workers) as pool:
+                # look for the rigs on the share while the camera and env load
+                checks = self._check_rigs(pool, assets)
+                self._import_camera()
+                self._import_env()
+                plan = self._plan_rigs(checks)
+        else:
+            self._import_camera()
+            self._import_env()
+            plan = []
 
         # Import Rigs
-        for asset_stub in self.shot.assets:
-            asset = self._conn.get_asset_by_stub(asset_stub)
-            if not asset.path:
-                continue
+        lazy = refloader.lazy_references()
+        for rig_path, namespace in plan:
+            mc.file(rig_path, reference=True, namespace=namespace, deferReference=lazy)
+        refloader.save_load_state()
+
+    def _shot_assets(self) -> list[Asset]:
+        """Look up the shot's assets that have a path in one query, in the
+        order of the shot's assets"""
+        if not self.shot.assets:
+            return []
+        by_id = {a.id: a for a in self._conn.get_assets_by_stub(self.shot.assets)}
+        assets = [by_id.get(asset_stub.id) for asset_stub in self.shot.assets]
+        return [asset for asset in assets if asset and asset.path]
+
+    @staticmethod
+    def _check_rigs(
+        pool: ThreadPoolExecutor, assets: list[Asset]
+    ) -> list[tuple[Asset, str, Future[bool]]]:
+        """Start checking for the rigs of `assets` in `pool`"""
+        checks: list[tuple[Asset, str, Future[bool]]] = []
+        for asset in assets:
+            assert asset.path is not None
             rig_path = "/".join(("production", asset.path, "rig", "rig.mb"))
-            if (get_production_path() / ".." / rig_path).exists():
-                mc.file(rig_path, reference=True, namespace=asset.name)
+            full_path = get_production_path() / ".." / rig_path
+            checks.append((asset, rig_path, pool.submit(full_path.exists)))
+        return checks
+
+    @staticmethod
+    def _plan_rigs(
+        checks: list[tuple[Asset, str, Future[bool]]],
+    ) -> list[tuple[str, str]]:
+        """The rig path and namespace of each reference to create, in the
+        order of the shot's assets"""
+        plan: list[tuple[str, str]] = []
+        for asset, rig_path, exists in checks:
+            if exists.result():
+                plan.append((rig_path, asset.name))
             else:
-                print(f'Unable to find rig for asset "{asset.disp_name}"')
+                log.warning(f'Unable to find rig for asset "{asset.disp_name}"')
+        return plan
 
     def _setup_file(self, path: Path, entity) -> None:
         mc.file(newFile=True, force=True)
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import attrs
-import numpy as np
 import mayaUsd.lib as mayaUsdLib  # type: ignore[import-not-found]
 
 from enum import IntEnum
@@ -19,11 +18,92 @@ class ChaserMode(IntEnum):
     CAM = 2
 
 
+SCALED_ATTRS = (UsdGeom.Tokens.points, UsdGeom.Tokens.extent)
+SCALED_XFORM_OPS = ("xformOp:translate", "xformOp:translate:pivot")
+
+
+# where the camera rig usually ends up in the export
+CAM_RIG_PATHS = (Sdf.Path("/WORLD/CAM/LnD_shotCam"), Sdf.Path("/LnD_shotCam"))
+
+
 @attrs.define
 class ChaserArgs:
     mode: ChaserMode = attrs.field(converter=int)
 
 
+def scale_layer_geo(
+    layer: Sdf.Layer, prim_paths: Iterable[Sdf.Path], scale_factor: float
+) -> None:
+    """Scale the points, extent and translation of the prims at `prim_paths`.
+    The time samples are read and written straight to the layer's specs in
+    a single change block, instead of going through `Usd.Attribute.Set` one
+    sample at a time. Only one attribute's samples are held in memory at
+    once.
+
+    This runs on one thread on purpose. numpy releases the GIL for the
+    multiply, but each result has to go back through
+    `Vt.Vec3fArray.FromNumpy`, which holds it and alone takes several times
+    longer than the VtArray multiply. See `usdchaserbench --workers`"""
+    prim_paths = list(prim_paths)
+    with Sdf.ChangeBlock():
+        for prim_path in prim_paths:
+            for attr in SCALED_ATTRS:
+                attr_path = prim_path.AppendProperty(attr)
+                if not (sample := _read_samples(layer, attr_path)):
+                    continue
+                for time, value in zip(*sample):
+                    # multiplying the VtArrays directly skips the copies in
+                    # and out of numpy, which cost more than the math
+                    value = value * scale_factor
+                    if time is None:
+                        layer.GetAttributeAtPath(attr_path).default = value
+                    else:
+                        layer.SetTimeSample(attr_path, time, value)
+
+        for prim_path in prim_paths:
+            for attr_name in SCALED_XFORM_OPS:
+                spec = layer.GetAttributeAtPath(prim_path.AppendProperty(attr_name))
+                if spec and spec.default is not None:
+                    spec.default = spec.default * scale_factor
+
+
+def _read_samples(
+    layer: Sdf.Layer, attr_path: Sdf.Path
+) -> tuple[list[float | None], list[Vt.Vec3fArray]] | None:
+    """Read every time sample of an attribute. Returns the times (None for
+    the default value) and the values"""
+    times: list[float | None] = list(layer.ListTimeSamplesForPath(attr_path))
+    if times:
+        return times, [layer.QueryTimeSample(attr_path, time) for time in times]
+
+    spec = layer.GetAttributeAtPath(attr_path)
+    if not spec or spec.default is None:
+        return None
+    return [None], [spec.default]
+
+
+def find_prim_spec(
+    layer: Sdf.Layer,
+    name: str,
+    known_paths: Iterable[Sdf.Path] = (),
+    root: Sdf.Path = Sdf.Path.absoluteRootPath,
+) -> Sdf.Path | None:
+    """Path of the first prim spec called `name` below `root`. The
+    `known_paths` are checked first, then the prim hierarchy is searched
+    depth first, skipping property specs and stopping at the first match"""
+    for path in known_paths:
+        if layer.GetPrimAtPath(path):
+            return path
+
+    stack = [layer.GetPrimAtPath(root)]
+    while stack:
+        children = stack.pop().nameChildren
+        if name in children:
+            return children[name].path
+        stack.extend(children.values())
+    return None
+
+
 class ExportChaser(mayaUsdLib.ExportChaser):
     ID: str = "lnd"
 
@@ -42,36 +122,17 @@ class ExportChaser(mayaUsdLib.ExportChaser):
     def scale_down_geo(self, scale_factor: float = 0.01) -> None:
         root_prim = self._stage.GetPseudoRoot()
 
+        prim_paths: list[Sdf.Path] = []
         for prim in (it := iter(Usd.PrimRange(root_prim))):
             if not (prim.IsA(UsdGeom.Mesh) or prim.IsA(UsdGeom.BasisCurves)):  # type: ignore[call-overload]
                 continue
             # don't recurse deeper than this
             it.PruneChildren()
+            prim_paths.append(prim.GetPath())
 
-            for attr_token in (UsdGeom.Tokens.points, UsdGeom.Tokens.extent):
-                attr = prim.GetAttribute(attr_token)
-                if not attr.IsValid():
-                    continue
-
-                frames: Iterable[Usd.TimeCode] = (
-                    (Usd.TimeCode(f) for f in attr.GetTimeSamples())
-                    if attr.GetNumTimeSamples()
-                    else (Usd.TimeCode.Default(),)
-                )
-
-                for frame in frames:
-                    data = np.array(attr.Get(frame))
-                    data *= scale_factor
-                    attr.Set(Vt.Vec3fArray.FromNumpy(data), frame)  # type: ignore[arg-type]
-
-            for attr_name in ("xformOp:translate", "xformOp:translate:pivot"):
-                attr = prim.GetAttribute(attr_name)
-                if not attr.IsValid():
-                    continue
-                data = attr.Get()
-                data *= scale_factor
-                attr.Set(data)
-
+        scale_layer_geo(
+            self._stage.GetEditTarget().GetLayer(), prim_paths, scale_factor
+        )
         UsdGeom.SetStageMetersPerUnit(self._stage, 1.0)
 
     def update_material_bindings(self) -> None:
@@ -111,28 +172,16 @@ class ExportChaser(mayaUsdLib.ExportChaser):
             with Sdf.ChangeBlock():
                 layer = self._stage.GetEditTarget().GetLayer()
 
-                world_ctrl_find: list[Sdf.Path] = []
-                cam_rig_root_find: list[Sdf.Path] = []
-
-                def traverse_kernel(path: Sdf.Path | str):
-                    if isinstance(path, str):
-                        path = Sdf.Path(path)
-                    if path.IsPrimPath():
-                        if path.name == "world_CTRL":
-                            world_ctrl_find.append(path)
-                        elif path.name == "LnD_shotCam":
-                            cam_rig_root_find.append(path)
-
-                layer.Traverse(Sdf.Path("/"), traverse_kernel)
+                cam_rig_root = find_prim_spec(layer, "LnD_shotCam", CAM_RIG_PATHS)
+                if cam_rig_root is None:
+                    raise RuntimeError("Could not find camera rig root in export!")
 
-                try:
-                    world_ctrl_path = world_ctrl_find.pop()
-                except IndexError:
+                # the control is in the rig, so look there before the rest
+                world_ctrl_path = find_prim_spec(
+                    layer, "world_CTRL", root=cam_rig_root
+                ) or find_prim_spec(layer, "world_CTRL")
+                if world_ctrl_path is None:
                     raise RuntimeError("Could not find world_CTRL in export!")
-                try:
-                    cam_rig_root = cam_rig_root_find.pop()
-                except IndexError:
-                    raise RuntimeError("Could not find camera rig root in export!")
 
                 if cam_rig_root != new_shotCam_path:
                     prim_spec = Sdf.CreatePrimInLayer(layer, new_shotCam_path)
@@ -0,0 +1,264 @@
+"""Benchmark the geometry scaling done by the USD export chaser on a
+synthetic animated layer. Needs mayapy for the chaser's imports, so run it
+through the pipeline:
+
+    __main__.py maya --python -- -m pipe.m.usdchaserbench --meshes 50"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pxr import Sdf, Usd, UsdGeom, Vt
+
+from pipe.m.usdchaser import (
+    CAM_RIG_PATHS,
+    SCALED_ATTRS,
+    SCALED_XFORM_OPS,
+    find_prim_spec,
+    scale_layer_geo,
+)
+
+if TYPE_CHECKING:
+    import typing
+
+log = logging.getLogger(__name__)
+
+SCALE_FACTOR = 0.01
+# extra properties on each control of the synthetic camera rig
+CTRL_PROPERTIES = 10
+
+
+def synthetic_layer(meshes: int, points: int, frames: int) -> Sdf.Layer:
+    """An anonymous layer of `meshes` meshes with `points` points each,
+    animated over `frames` frames, like an animated rig export"""
+    layer = Sdf.Layer.CreateAnonymous(".usda")
+    rng = np.random.default_rng(0)
+    with Sdf.ChangeBlock():
+        for path in ("/ROOT", "/ROOT/GEO"):
+            xform = Sdf.CreatePrimInLayer(layer, path)
+            xform.specifier = Sdf.SpecifierDef
+            xform.typeName = "Xform"
+
+        for i in range(meshes):
+            prim = Sdf.CreatePrimInLayer(layer, f"/ROOT/GEO/mesh_{i}")
+            prim.specifier = Sdf.SpecifierDef
+            prim.typeName = "Mesh"
+            points_attr = Sdf.AttributeSpec(
+                prim, UsdGeom.Tokens.points, Sdf.ValueTypeNames.Point3fArray
+            )
+            extent_attr = Sdf.AttributeSpec(
+                prim, UsdGeom.Tokens.extent, Sdf.ValueTypeNames.Float3Array
+            )
+            translate = Sdf.AttributeSpec(
+                prim, "xformOp:translate", Sdf.ValueTypeNames.Double3
+            )
+            translate.default = (i * 10.0, 0.0, 0.0)
+
+            base = rng.random((points, 3), dtype=np.float32) * 100
+            for frame in range(frames):
+                pts = base + np.float32(frame)
+                layer.SetTimeSample(
+                    points_attr.path, frame, Vt.Vec3fArray.FromNumpy(pts)
+                )
+                layer.SetTimeSample(
+                    extent_attr.path,
+                    frame,
+                    Vt.Vec3fArray.FromNumpy(np.stack([pts.min(0), pts.max(0)])),
+                )
+    return layer
+
+
+def scale_per_sample(stage: Usd.Stage, scale_factor: float) -> None:
+    """The chaser's original approach, for comparison. Goes through the Usd
+    API one time sample at a time"""
+    for prim in stage.Traverse():
+        if not prim.IsA(UsdGeom.Mesh):  # type: ignore[call-overload]
+            continue
+        for attr_token in SCALED_ATTRS:
+            attr = prim.GetAttribute(attr_token)
+            for frame in (Usd.TimeCode(f) for f in attr.GetTimeSamples()):
+                data = np.array(attr.Get(frame))
+                data *= scale_factor
+                attr.Set(Vt.Vec3fArray.FromNumpy(data), frame)  # type: ignore[arg-type]
+        for attr_name in SCALED_XFORM_OPS:
+            attr = prim.GetAttribute(attr_name)
+            if attr.IsValid():
+                attr.Set(attr.Get() * scale_factor)
+
+
+def scale_bulk(stage: Usd.Stage, scale_factor: float) -> None:
+    scale_layer_geo(
+        stage.GetRootLayer(),
+        [prim.GetPath() for prim in stage.Traverse() if prim.IsA(UsdGeom.Mesh)],  # type: ignore[call-overload]
+        scale_factor,
+    )
+
+
+def scale_numpy_pool(stage: Usd.Stage, scale_factor: float, workers: int) -> None:
+    """Multiply views of each attribute's samples in numpy on `workers`
+    threads, for comparison with the chaser's single thread"""
+    layer = stage.GetRootLayer()
+    attr_paths = [
+        prim.GetPath().AppendProperty(attr)
+        for prim in stage.Traverse()
+        if prim.IsA(UsdGeom.Mesh)  # type: ignore[call-overload]
+        for attr in SCALED_ATTRS
+    ]
+
+    def inner(values: list[Vt.Vec3fArray]) -> list[np.ndarray]:
+        return [
+            np.multiply(np.asarray(value), scale_factor, dtype=np.float32)
+            for value in values
+        ]
+
+    with ThreadPoolExecutor(workers) as pool, Sdf.ChangeBlock():
+        times = [layer.ListTimeSamplesForPath(path) for path in attr_paths]
+        futures = [
+            pool.submit(inner, [layer.QueryTimeSample(path, t) for t in ts])
+            for path, ts in zip(attr_paths, times)
+        ]
+        for path, ts, future in zip(attr_paths, times, futures):
+            for t, scaled in zip(ts, future.result()):
+                layer.SetTimeSample(path, t, Vt.Vec3fArray.FromNumpy(scaled))
+
+
+def bench(meshes: int, points: int, frames: int, workers: int) -> dict[str, float]:
+    """Time each scaling approach on its own copy of a synthetic layer and
+    check they agree"""
+    approaches: dict[str, typing.Callable[[Usd.Stage], None]] = {
+        "per-sample": lambda stage: scale_per_sample(stage, SCALE_FACTOR),
+        "bulk": lambda stage: scale_bulk(stage, SCALE_FACTOR),
+        f"numpy x{workers}": lambda stage: scale_numpy_pool(
+            stage, SCALE_FACTOR, workers
+        ),
+    }
+    timings: dict[str, float] = {}
+    results: list[np.ndarray] = []
+    for name, fn in approaches.items():
+        stage = Usd.Stage.Open(synthetic_layer(meshes, points, frames))
+        start = time.time()
+        fn(stage)
+        timings[name] = time.time() - start
+        results.append(_points(stage))
+
+    # the approaches round differently in the last place
+    if not all(np.allclose(result, results[0]) for result in results):
+        raise RuntimeError("Scaling approaches gave different results")
+    return timings
+
+
+def _points(stage: Usd.Stage) -> np.ndarray:
+    return np.concatenate(
+        [
+            np.asarray(attr.Get(frame))
+            for prim in stage.Traverse()
+            for attr in (prim.GetAttribute(token) for token in SCALED_ATTRS)
+            if attr.IsValid()
+            for frame in attr.GetTimeSamples()
+        ]
+    )
+
+
+def synthetic_cam_layer(depth: int, breadth: int, frames: int) -> Sdf.Layer:
+    """An anonymous layer with a camera rig at /WORLD/CAM/LnD_shotCam made of
+    `breadth` controls per level, `depth` levels deep, with world_CTRL at
+    the bottom. Each control has an animated translate and a few more
+    properties, like the visibility and custom attributes of a real rig"""
+    layer = Sdf.Layer.CreateAnonymous(".usda")
+    with Sdf.ChangeBlock():
+        parents = [Sdf.CreatePrimInLayer(layer, CAM_RIG_PATHS[0])]
+        for level in range(depth):
+            children: list[Sdf.PrimSpec] = []
+            for parent in parents:
+                for i in range(breadth):
+                    prim = Sdf.PrimSpec(parent, f"ctrl_{level}_{i}", Sdf.SpecifierDef)
+                    attr = Sdf.AttributeSpec(
+                        prim, "xformOp:translate", Sdf.ValueTypeNames.Double3
+                    )
+                    for frame in range(frames):
+                        layer.SetTimeSample(attr.path, frame, (frame, 0.0, 0.0))
+                    for j in range(CTRL_PROPERTIES):
+                        Sdf.AttributeSpec(prim, f"attr_{j}", Sdf.ValueTypeNames.Double)
+                    children.append(prim)
+            # only the first branch keeps going, like a deep rig
+            parents = children[:1] if level < depth - 1 else []
+            if not parents:
+                Sdf.PrimSpec(children[-1], "world_CTRL", Sdf.SpecifierDef)
+    return layer
+
+
+def find_by_traverse(layer: Sdf.Layer) -> tuple[Sdf.Path, Sdf.Path]:
+    """The chaser's original lookup, for comparison. Visits every spec in the
+    layer"""
+    found: dict[str, Sdf.Path] = {}
+
+    def inner(path: Sdf.Path | str) -> None:
+        path = Sdf.Path(path)
+        if path.IsPrimPath() and path.name in ("world_CTRL", "LnD_shotCam"):
+            found[path.name] = path
+
+    layer.Traverse(Sdf.Path("/"), inner)
+    return found["LnD_shotCam"], found["world_CTRL"]
+
+
+def find_targeted(layer: Sdf.Layer) -> tuple[Sdf.Path, Sdf.Path]:
+    cam_rig_root = find_prim_spec(layer, "LnD_shotCam", CAM_RIG_PATHS)
+    assert cam_rig_root
+    world_ctrl = find_prim_spec(layer, "world_CTRL", root=cam_rig_root)
+    assert world_ctrl
+    return cam_rig_root, world_ctrl
+
+
+def bench_cam(depth: int, breadth: int, frames: int) -> dict[str, float]:
+    """Time finding the camera rig in a synthetic layer with each lookup"""
+    layer = synthetic_cam_layer(depth, breadth, frames)
+    timings: dict[str, float] = {}
+    results: list[tuple[Sdf.Path, Sdf.Path]] = []
+    for name, fn in (("traverse", find_by_traverse), ("targeted", find_targeted)):
+        start = time.time()
+        results.append(fn(layer))
+        timings[name] = time.time() - start
+
+    if results[0] != results[1]:
+        raise RuntimeError(f"Lookups found different prims: {results}")
+    return timings
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--meshes", type=int, default=50)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--cam",
+        action="store_true",
+        help="Time finding the camera rig instead of scaling geometry. "
+        "--meshes sets the rig depth and --points the controls per level",
+    )
+    args = parser.parse_args(argv)
+
+    if args.cam:
+        cam_timings = bench_cam(args.meshes, args.points, args.frames)
+        print(
+            f"camera rig {args.meshes} deep x {args.points} wide, {args.frames} frames"
+        )
+        for name, seconds in cam_timings.items():
+            print(f"{name:<12}{seconds:>8.4f}s")
+        return
+
+    timings = bench(args.meshes, args.points, args.frames, args.workers)
+    print(f"{args.meshes} meshes x {args.points} points x {args.frames} frames")
+    for name, seconds in timings.items():
+        print(f"{name:<12}{seconds:>8.2f}s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -24,7 +24,14 @@ from pipe.struct.material import (
     MaterialInfo,
 )
 from pipe.glui.dialogs import MessageDialog
-from pipe.texconverter import TexConverter, TexConversionError
+from pipe.texconverter import (
+    ConversionJob,
+    ProgressEvent,
+    TexConversionCancelled,
+    TexConversionError,
+    TexConverter,
+    TimingHistory,
+)
 from shared.util import get_production_path, resolve_mapped_path
 from env_sg import DB_Config
 
@@ -50,14 +57,30 @@ class Exporter:
     _conn: DB
     _out_path: Path
     _preview_path: Path
+    _progress_callback: typing.Callable[[ProgressEvent], None] | None
     _src_path: Path
+    _store_path: Path
+    _tex_converter: TexConverter | None
     _tex_path: Path
 
-    def __init__(self) -> None:
+    def __init__(
+        self, progress_callback: typing.Callable[[ProgressEvent], None] | None = None
+    ) -> None:
         self._conn = DB.Get(DB_Config)
         id = sp.project.Metadata("LnD").get("asset_id")
         assert (a := self._conn.get_asset_by_id(id)) is not None
         self._asset = a
+        self._progress_callback = progress_callback
+        self._tex_converter = None
+
+    def cancel(self) -> None:
+        """Cancel the texture conversion of a running export"""
+        if self._tex_converter:
+            self._tex_converter.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return bool(self._tex_converter and self._tex_converter.cancelled)
 
     def _init_paths(self, mat_var: str) -> None:
         # initialize paths, pulling from SG database
@@ -68,6 +91,10 @@ class Exporter:
         self._src_path = self._out_path / "src"
         self._tex_path = self._out_path / "tex"
         self._preview_path = self._out_path / "preview"
+        # converted textures shared by all material variants
+        self._store_path = resolve_mapped_path(
+            get_production_path() / self._asset.tex_path / "store"
+        )
 
         # create paths if not exist
         self._src_path.mkdir(parents=True, exist_ok=True)
@@ -78,8 +105,13 @@ class Exporter:
         self,
         exp_setting_arr: typing.Sequence[TexSetExportSettings],
         mat_var: str,
+        group_size: int | None = None,
     ) -> bool:
-        """Export all the textures of the given Texture Sets"""
+        """Export all the textures of the given Texture Sets
+
+        If `group_size` is set, the Texture Sets are exported that many at a
+        time, and each group's textures start converting while the next group
+        is being exported"""
         self._init_paths(mat_var)
 
         try:
@@ -91,25 +123,60 @@ class Exporter:
             ).exec_()
             return False
 
-        config = Exporter._generate_config(self._src_path, exp_setting_arr)
-        log.debug(config)
-
-        export_result: sp.export.TextureExportResult
-        try:
-            export_result = sp.export.export_project_textures(config)
-        except Exception as e:
-            print(e)
-            return False
-
-        self.write_mat_info(exp_setting_arr)
-
-        tex_converter = TexConverter(
-            self._tex_path, self._preview_path, export_result.textures.values()
+        history = TimingHistory()
+        self._tex_converter = tex_converter = TexConverter(
+            self._tex_path,
+            self._preview_path,
+            [],
+            self._progress_callback,
+            history=history,
+            store=self._store_path,
         )
 
+        group_size = max(1, group_size or len(exp_setting_arr))
+        exported_imgs: list[list[str]] = []
+        tex_jobs: list[ConversionJob] = []
+
         try:
-            tex_converter.convert_tex()
-            tex_converter.convert_previewsurface()
+            for i in range(0, len(exp_setting_arr), group_size):
+                group = exp_setting_arr[i : i + group_size]
+                config = Exporter._generate_config(self._src_path, group)
+                log.debug(config)
+
+                export_result: sp.export.TextureExportResult
+                try:
+                    export_result = sp.export.export_project_textures(config)
+                except Exception as e:
+                    print(e)
+                    # let conversions that have already started finish cleanly
+                    tex_converter.wait(tex_jobs)
+                    return False
+
+                imgs = list(export_result.textures.values())
+                exported_imgs += imgs
+                tex_jobs += tex_converter.submit_tex(imgs)
+
+                # update progress and check for cancellation between groups
+                tex_converter.poll()
+                if tex_converter.cancelled:
+                    tex_converter.wait(tex_jobs)
+
+            self.write_mat_info(exp_setting_arr)
+
+            finished_imgs = tex_converter.wait(tex_jobs)
+            if len(finished_imgs) != len([j for j in tex_jobs if j.check]):
+                raise TexConversionError("Not all png textures were converted")
+
+            tex_converter.imgs_by_tex_set = exported_imgs
+            tex_converter.convert_previewsurface(in_process=True)
+
+            # drop the textures this export superseded in every variant
+            tex_converter.prune_store(
+                variant / "tex" for variant in self._out_path.parent.iterdir()
+            )
+        except TexConversionCancelled:
+            log.info("Texture conversion cancelled")
+            return False
         except TexConversionError:
             MessageDialog(
                 get_main_qt_window(),
@@ -120,6 +187,8 @@ class Exporter:
                 ),
             ).exec_()
             return False
+        finally:
+            history.close()
 
         return True
 
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import logging
 import os
-from math import log2
+from math import ceil, log2
 from Qt import QtCore, QtWidgets
 from Qt.QtGui import QIcon, QPixmap, QRegExpValidator
 from Qt.QtWidgets import QComboBox, QLabel, QLayout, QMainWindow
@@ -21,6 +21,7 @@ from pipe.sp.export import Exporter, TexSetExportSettings
 from pipe.sp.local import get_main_qt_window
 from pipe.struct.db import Asset
 from pipe.struct.material import DisplacementSource, NormalSource, NormalType
+from pipe.texconverter import ProgressEvent
 from pipe.util import checkbox_callback_helper, dict_index
 
 from env_sg import DB_Config
@@ -161,8 +162,20 @@ class SubstanceExportWindow(QMainWindow, ButtonPair):
             self._conn.update_asset(self._asset)
 
         log.info("Exporting!")
-        exporter = Exporter()
-        if exporter.export(
+        progress = QtWidgets.QProgressDialog(
+            "Exporting textures...", "Cancel", 0, 0, self
+        )
+        progress.setWindowTitle("LnD Publish Textures")
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        progress.show()
+
+        exporter = Exporter(self._progress_updater(progress))
+        progress.canceled.connect(exporter.cancel)
+
+        success = exporter.export(
             [
                 TexSetExportSettings(
                     ts,
@@ -176,11 +189,26 @@ class SubstanceExportWindow(QMainWindow, ButtonPair):
                 if wgt.enabled
             ],
             self.mat_var,
-        ):
+            group_size=1,
+        )
+        cancelled = exporter.cancelled
+        progress.canceled.disconnect(exporter.cancel)
+        progress.close()
+
+        if success:
             MessageDialog(
                 get_main_qt_window(),
                 "Textures successfully exported!",
             ).exec_()
+        elif cancelled:
+            MessageDialog(
+                get_main_qt_window(),
+                (
+                    "Export cancelled. Partially converted textures have been "
+                    "removed, so please export again before rendering this "
+                    "asset."
+                ),
+            ).exec_()
         else:
             MessageDialog(
                 get_main_qt_window(),
@@ -192,6 +220,27 @@ class SubstanceExportWindow(QMainWindow, ButtonPair):
 
         self.close()
 
+    @staticmethod
+    def _progress_updater(
+        progress: QtWidgets.QProgressDialog,
+    ) -> typing.Callable[[ProgressEvent], None]:
+        """Callback function generator to show conversion progress"""
+
+        def inner(event: ProgressEvent) -> None:
+            progress.setMaximum(event.total)
+            progress.setValue(event.finished + event.failed)
+            label = f"Converting textures: {event.finished} of {event.total} done"
+            if event.failed:
+                label += f", {event.failed} failed"
+            if event.eta:
+                minutes, seconds = divmod(ceil(event.eta), 60)
+                label += f"\nAbout {minutes}:{seconds:02} remaining"
+            progress.setLabelText(label)
+            # keep the UI (and the cancel button) responsive
+            QtWidgets.QApplication.processEvents()
+
+        return inner
+
 
 class TexSetWidget(QtWidgets.QWidget):
     extra_channels: set[sp.textureset.Channel]
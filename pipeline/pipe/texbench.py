@@ -0,0 +1,152 @@
+"""Benchmark the texture conversion settings used by `TexConverter`.
+
+Runs a synthetic texture set through each `ConversionProfile`, records the
+timings to the `TimingHistory` and prints a comparison. Run with
+`python -m pipe.texbench`"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from env import Executables
+
+from pipe.texconverter import (
+    DEFAULT_PROFILE,
+    ConversionProfile,
+    TexConverter,
+    TimingHistory,
+)
+from pipe.util import silent_startupinfo
+
+if TYPE_CHECKING:
+    import typing
+
+log = logging.getLogger(__name__)
+
+PROFILES = [
+    DEFAULT_PROFILE,
+    ConversionProfile("lossless", color_compression="lossless"),
+    ConversionProfile("lzw", data_compression="lzw"),
+    ConversionProfile("contig", planarconfig=None),
+    *(ConversionProfile(f"procs{n}", max_procs=n) for n in (6, 12, 36)),
+]
+
+# (map name, channels). Maps with "Color" in the name take the color path
+MAPS = [
+    ("BaseColor_ACEScg", 3),
+    ("Emissive_ACEScg", 3),
+    ("Roughness_Raw", 1),
+    ("Metallic_Raw", 1),
+    ("Normal_Raw", 3),
+]
+
+
+def generate_tex_set(dir: Path, name: str, resolution: int, udims: int) -> list[str]:
+    """Write a texture set of noise images, like a Substance export"""
+    imgs: list[str] = []
+    for map_name, channels in MAPS:
+        for udim in range(1001, 1001 + udims):
+            img = dir / f"{name}_{map_name}.{udim}.png"
+            # fmt: off
+            subprocess.check_call(
+                [
+                    str(Executables.oiiotool),
+                    "--pattern", f"noise:type=uniform:seed={udim}",
+                    f"{resolution}x{resolution}", str(channels),
+                    "-d", "uint8" if channels == 3 else "uint16",
+                    "-o", str(img),
+                ],
+                startupinfo=silent_startupinfo(),
+            )
+            # fmt: on
+            imgs.append(str(img))
+    return imgs
+
+
+def run_profile(
+    profile: ConversionProfile,
+    imgs_by_tex_set: list[list[str]],
+    history: TimingHistory,
+) -> float:
+    """Convert the textures with `profile`, returning the total wall time"""
+    with tempfile.TemporaryDirectory(prefix="texbench_") as tmp:
+        converter = TexConverter(
+            Path(tmp), Path(tmp), [], profile=profile, history=history
+        )
+        start = time.time()
+        converter.wait(converter.submit_tex(imgs_by_tex_set))
+        return time.time() - start
+
+
+def report(
+    history: TimingHistory, totals: dict[str, float]
+) -> list[dict[str, typing.Any]]:
+    """Print a comparison of the profiles run under the history's run label"""
+    rows = history.summary()
+    baseline = totals.get(DEFAULT_PROFILE.name)
+
+    print(f"Texture conversion benchmark: {history.run}")
+    print(
+        f"{'profile':<12}{'jobs':>6}{'failed':>8}{'total (s)':>11}{'vs default':>12}"
+        f"{'cpu (s)':>10}{'peak rss (MB)':>15}{'output (MB)':>13}"
+    )
+    for row in rows:
+        total = totals.get(row["profile"], 0.0)
+        ratio = f"{total / baseline:.2f}x" if baseline else "-"
+        print(
+            f"{row['profile']:<12}{row['jobs']:>6}{row['failed']:>8}"
+            f"{total:>11.1f}{ratio:>12}{row['cpu_time'] or 0:>10.1f}"
+            f"{(row['peak_rss'] or 0) / 2**20:>15.0f}"
+            f"{(row['output_size'] or 0) / 2**20:>13.1f}"
+        )
+    return rows
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--resolution", type=int, default=2048)
+    parser.add_argument("--udims", type=int, default=4)
+    parser.add_argument("--sets", type=int, default=2)
+    parser.add_argument(
+        "--profiles",
+        nargs="*",
+        choices=[p.name for p in PROFILES],
+        help="Profiles to run. Defaults to all of them",
+    )
+    parser.add_argument("--db", type=Path, help="Timing database to record to")
+    args = parser.parse_args(argv)
+
+    profiles = [p for p in PROFILES if not args.profiles or p.name in args.profiles]
+    history = TimingHistory(
+        args.db, run=f"texbench {time.strftime('%Y-%m-%d %H:%M:%S')}"
+    )
+
+    src = Path(tempfile.mkdtemp(prefix="texbench_src_"))
+    try:
+        log.info("Generating synthetic textures")
+        imgs_by_tex_set = [
+            generate_tex_set(src, f"set{i}", args.resolution, args.udims)
+            for i in range(args.sets)
+        ]
+
+        totals: dict[str, float] = {}
+        for profile in profiles:
+            log.info(f"Running profile {profile.name}")
+            totals[profile.name] = run_profile(profile, imgs_by_tex_set, history)
+
+        report(history, totals)
+    finally:
+        history.close()
+        shutil.rmtree(src, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
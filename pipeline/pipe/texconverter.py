@@ -1,24 +1,43 @@
 from __future__ import annotations
 
+import hashlib
 import logging
 import os
+import platform
+import queue
 import re
+import sqlite3
 import subprocess
+import sys
+import threading
 import time
 
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from enum import Enum, auto
 from math import ceil, floor, log2, sqrt
 from pathlib import Path
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     import typing
 
+    from typing_extensions import Self
+
     RT = typing.TypeVar("RT")  # return type
 
-from pipe.util import silent_startupinfo
+from pipe.util import file_digest, link_or_copy, silent_startupinfo
 
 from env import Executables
 
+# numpy and Pillow are only needed for building preview mosaics in-process
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = None  # type: ignore[assignment]
+    Image = None  # type: ignore[assignment]
+
 
 log = logging.getLogger(__name__)
 
@@ -27,30 +46,304 @@ class TexConversionError(ChildProcessError):
     pass
 
 
+class TexConversionCancelled(TexConversionError):
+    pass
+
+
+class JobStatus(Enum):
+    QUEUED = auto()
+    STARTED = auto()
+    FINISHED = auto()
+    FAILED = auto()
+    CANCELLED = auto()
+
+
+@dataclass(eq=False)
+class ConversionJob:
+    """A single conversion command and the file it is expected to write"""
+
+    cmd: list[str]
+    output: Path
+    check: bool = True
+    depends_on: ConversionJob | None = None
+    status: JobStatus = JobStatus.QUEUED
+    start_time: float = 0.0
+    end_time: float = 0.0
+    cpu_time: float | None = None
+    peak_rss: int | None = None
+    store_key: str | None = None
+    store_lookup: Future[None] | None = field(default=None, repr=False)
+    proc: subprocess.Popen | None = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status not in (JobStatus.QUEUED, JobStatus.STARTED)
+
+    @property
+    def duration(self) -> float:
+        return self.end_time - self.start_time
+
+    @property
+    def tool(self) -> str:
+        return Path(self.cmd[0]).stem
+
+
+@dataclass(frozen=True)
+class ConversionProfile:
+    """Settings that control how textures are converted. `planarconfig` is
+    omitted from the command if it is None"""
+
+    name: str
+    color_compression: str = "lzw"
+    data_compression: str = "lossless"
+    planarconfig: str | None = "separate"
+    max_procs: int = 18
+
+
+DEFAULT_PROFILE = ConversionProfile("default")
+
+
+class TimingHistory:
+    """Local SQLite database of how long conversion commands took. Used for
+    ETAs and to compare `ConversionProfile`s"""
+
+    path: Path
+    run: str
+
+    _closed: bool
+    _conn: sqlite3.Connection | None
+    _conn_lock: threading.Lock
+
+    DEFAULT_PATH = Path(
+        os.getenv("PIPE_TIMING_DB", Path.home() / ".lnd_texconverter_timing.sqlite")
+    )
+
+    def __init__(self, path: Path | None = None, run: str = "") -> None:
+        self.path = path or self.DEFAULT_PATH
+        self.run = run
+        self._closed = False
+        self._conn = None
+        self._conn_lock = threading.Lock()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        """The history's connection, opened on first use. It's shared with
+        the converter's worker thread, so callers must hold `_conn_lock`"""
+        if self._closed:
+            # same as using a closed sqlite3.Connection
+            raise sqlite3.ProgrammingError("closed")
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS conversions (
+                    timestamp REAL,
+                    host TEXT,
+                    run TEXT,
+                    profile TEXT,
+                    tool TEXT,
+                    status TEXT,
+                    output TEXT,
+                    wall_time REAL,
+                    cpu_time REAL,
+                    peak_rss INTEGER,
+                    output_size INTEGER
+                )"""
+            )
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        """Close the connection. Timings recorded afterwards are dropped"""
+        with self._conn_lock:
+            self._closed = True
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def record(
+        self, jobs: typing.Iterable[ConversionJob], profile: ConversionProfile
+    ) -> None:
+        """Store the timings of finished jobs in a single transaction"""
+        rows = []
+        for job in jobs:
+            try:
+                output_size: int | None = job.output.stat().st_size
+            except OSError:
+                output_size = None
+            rows.append(
+                (
+                    job.end_time,
+                    platform.node(),
+                    self.run,
+                    profile.name,
+                    job.tool,
+                    job.status.name,
+                    str(job.output),
+                    job.duration,
+                    job.cpu_time,
+                    job.peak_rss,
+                    output_size,
+                )
+            )
+        if not rows:
+            return
+
+        try:
+            with self._conn_lock, self._connect() as conn:
+                conn.executemany(
+                    "INSERT INTO conversions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as e:
+            log.warning(f"Could not record conversion timing: {e}")
+
+    def mean_wall_times(self, profile: ConversionProfile) -> dict[str, float]:
+        """Average wall time of successful commands by tool"""
+        try:
+            with self._conn_lock:
+                cursor = self._connect().execute(
+                    "SELECT tool, AVG(wall_time) FROM conversions "
+                    "WHERE profile = ? AND status = ? GROUP BY tool",
+                    (profile.name, JobStatus.FINISHED.name),
+                )
+                rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            log.warning(f"Could not read conversion timings: {e}")
+            return {}
+        return dict(rows)
+
+    def summary(self, run: str | None = None) -> list[dict[str, typing.Any]]:
+        """Per-profile totals for a run (defaults to this history's run)"""
+        with self._conn_lock:
+            cursor = self._connect().cursor()
+            cursor.row_factory = sqlite3.Row
+            rows = cursor.execute(
+                """SELECT profile,
+                    COUNT(*) AS jobs,
+                    SUM(status != ?) AS failed,
+                    SUM(wall_time) AS wall_time,
+                    SUM(cpu_time) AS cpu_time,
+                    MAX(peak_rss) AS peak_rss,
+                    SUM(output_size) AS output_size
+                FROM conversions WHERE run = ? GROUP BY profile ORDER BY profile""",
+                (JobStatus.FINISHED.name, self.run if run is None else run),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    """Progress of a `TexConverter`. `job` and `status` are None for the
+    periodic events sent while waiting on running jobs"""
+
+    job: ConversionJob | None
+    status: JobStatus | None
+    finished: int
+    failed: int
+    total: int
+    eta: float | None
+
+
 class TexConverter:
     tex_path: Path
     preview_path: Path
     imgs_by_tex_set: typing.Iterable[list[str]]
+    store: Path | None
+    history: TimingHistory | None
+    profile: ConversionProfile
+    progress_callback: typing.Callable[[ProgressEvent], None] | None
+
+    _cancelled: threading.Event
+    _events: queue.Queue[ProgressEvent]
+    _historical_times: dict[str, float]
+    _jobs: list[ConversionJob]
+    _lock: threading.Lock
+    _store_pool: ThreadPoolExecutor | None
+    _tex_path_cleaned: bool
+    _worker: threading.Thread | None
+
+    POLL_INTERVAL = 0.1
+    # hashing the source images waits on the share, not the CPU
+    STORE_LOOKUP_WORKERS = 4
+    # leave store entries this new alone, they may be about to be linked
+    STORE_PRUNE_AGE = 3600.0
 
     def __init__(
         self,
         tex_path: Path,
         preview_path: Path,
         imgs_by_tex_set: typing.Iterable[list[str]],
+        progress_callback: typing.Callable[[ProgressEvent], None] | None = None,
+        profile: ConversionProfile = DEFAULT_PROFILE,
+        history: TimingHistory | None = None,
+        store: Path | None = None,
     ) -> None:
+        """If `store` is set, converted textures are kept there by content
+        and linked into `tex_path`, so identical source images (e.g. shared
+        between material variants) are only converted once. Timings are only
+        recorded if a `history` is given"""
         self.tex_path = tex_path
         self.preview_path = preview_path
         self.imgs_by_tex_set = imgs_by_tex_set
+        self.store = store
+        self.progress_callback = progress_callback
+        self.profile = profile
+        self.history = history
+        self._historical_times = history.mean_wall_times(profile) if history else {}
+
+        self._cancelled = threading.Event()
+        self._events = queue.Queue()
+        self._jobs = []
+        self._lock = threading.Lock()
+        self._store_pool = (
+            ThreadPoolExecutor(
+                self.STORE_LOOKUP_WORKERS, thread_name_prefix="TexStoreLookup"
+            )
+            if store
+            else None
+        )
+        self._tex_path_cleaned = False
+        self._worker = None
+
+    def cancel(self) -> None:
+        """Stop converting. Running processes are terminated, their partial
+        output is removed and the waiting conversion raises
+        `TexConversionCancelled`"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
 
     def convert_tex(self) -> list[Path]:
         """Convert all .png textures in the most recent export to .tex"""
+        jobs = self.submit_tex(self.imgs_by_tex_set)
+        finished_imgs = self.wait(jobs)
+
+        if len(finished_imgs) != len([j for j in jobs if j.check]):
+            raise TexConversionError("Not all png textures were converted")
+
+        return finished_imgs
+
+    def submit_tex(
+        self, imgs_by_tex_set: typing.Iterable[list[str]]
+    ) -> list[ConversionJob]:
+        """Start converting the .png textures of the given texture sets to
+        .tex without waiting for them to finish"""
 
         assert self.tex_path is not None
 
         # Remove any corrupted tex files from a previous export
-        for file in self.tex_path.iterdir():
-            if file.name.endswith(".temp.tex"):
-                file.unlink()
+        if not self._tex_path_cleaned:
+            for file in self.tex_path.iterdir():
+                if file.name.endswith(".temp.tex"):
+                    file.unlink()
+            self._tex_path_cleaned = True
 
         @self._debug_out
         def tex_cmd(img: str, is_color: bool = False) -> list[str]:
@@ -67,8 +360,15 @@ class TexConverter:
                         "--dither",
                     ] if is_color else []
                 ),
-                "--compression", "lzw" if is_color else "lossless",
-                "--planarconfig", "separate",
+                "--compression", (
+                    self.profile.color_compression
+                    if is_color
+                    else self.profile.data_compression
+                ),
+                *(
+                    ["--planarconfig", self.profile.planarconfig]
+                    if self.profile.planarconfig else []
+                ),
                 "-otex:fileformatname=tx:wrap=clamp:resize=1:prman_options=1",
                 f"{str(self.tex_path / Path(img).stem.replace('ACEScg', 'srgb-ap1'))}.tex",
             ]
@@ -116,56 +416,86 @@ class TexConverter:
             ]
             # fmt: on
 
-        pre_cmdlines: list[list[str]] = []
-        cmdlines: list[list[str]] = []
-        for imgs in self.imgs_by_tex_set:
+        jobs: list[ConversionJob] = []
+        for imgs in imgs_by_tex_set:
             log.debug(imgs)
             for img in imgs:
                 if img.endswith(".jpeg"):
                     continue
                 log.debug(f"        {img}")
                 if "pre-b2r" in img:
-                    pre_cmdlines.append(norm2height(img))
-                    cmdlines.append(b2r_cmd(img.replace(".pre-b2r", "")))
+                    height_img = img.replace(".pre-b2r", "")
+                    pre_job = ConversionJob(
+                        norm2height(img), Path(height_img), check=False
+                    )
+                    chain = [
+                        pre_job,
+                        self._job(b2r_cmd(height_img), depends_on=pre_job),
+                    ]
                 else:
-                    cmdlines.append(tex_cmd(img, ("Color" in img or "Emissive" in img)))
+                    chain = [
+                        self._job(tex_cmd(img, ("Color" in img or "Emissive" in img)))
+                    ]
 
-        self._wait_and_check_cmds(pre_cmdlines, skip_check=True)
-        finished_imgs = self._wait_and_check_cmds(cmdlines)
+                if self._store_pool:
+                    # hashing reads the whole image from the share. Do it
+                    # off the calling thread; the chain waits for it
+                    chain[0].store_lookup = self._store_pool.submit(
+                        self._link_from_store, img, chain
+                    )
+                jobs += chain
 
-        if len(finished_imgs) != len(cmdlines):
-            raise TexConversionError("Not all png textures were converted")
+        self._submit(jobs)
+        return jobs
 
-        return finished_imgs
+    def convert_previewsurface(self, in_process: bool = False) -> list[Path]:
+        """Compile all .jpeg textures in the most recent export to UDIM-less tiles
 
-    def convert_previewsurface(self) -> list[Path]:
-        """Compile all .jpeg textures in the most recent export to UDIM-less tiles"""
+        If `in_process` is set and numpy and Pillow are available, the mosaics
+        are assembled in this process instead of by `oiiotool`"""
 
         assert self.preview_path is not None
 
-        @self._debug_out
-        def jpeg_cmd(root: Path, imgs: typing.Sequence[str]) -> list[str]:
-            dimx, dimy = self._img_dims(imgs[0])
-
-            img_name = re.search(r"^(.*_)(.+)$", root.name)
-            assert img_name is not None
-            name_base, color_space = img_name.group(1, 2)
+        img_groups = self._preview_groups()
+
+        if in_process and Image is None:
+            log.warning("Pillow is not available, falling back to oiiotool")
+            in_process = False
+
+        if in_process:
+            finished_imgs = self._mosaic_previews(img_groups)
+        else:
+
+            @self._debug_out
+            def jpeg_cmd(root: Path, imgs: typing.Sequence[str]) -> list[str]:
+                dimx, dimy = self._img_dims(imgs[0])
+                grid_base, grid_height = self._preview_grid(len(imgs))
+
+                # fmt: off
+                return [
+                    str(Executables.oiiotool), 
+                    *imgs,
+                    "--mosaic", f"{grid_base}x{grid_height}",
+                    "--resize", f"{dimx}x{dimy}",
+                    "-o", str(self._preview_out_path(root)),
+                ]
+                # fmt: on
+
+            jobs = [
+                self._job(jpeg_cmd(Path(root), sorted(imgs)))
+                for root, imgs in img_groups.items()
+            ]
+            self._submit(jobs)
+            finished_imgs = self.wait(jobs)
 
-            count = len(imgs)
-            grid_height = int(floor(sqrt(count)))
-            grid_base = int(grid_height + ceil(count / grid_height - grid_height))
+        if len(finished_imgs) != len(img_groups):
+            raise TexConversionError("Not all jpeg textures were converted")
 
-            # fmt: off
-            return [
-                str(Executables.oiiotool), 
-                *imgs,
-                "--mosaic", f"{grid_base}x{grid_height}",
-                "--resize", f"{dimx}x{dimy}",
-                "-o", f"{str(self.preview_path / name_base)}{'sRGB' if color_space == 'sRGB-Texture' else 'Linear'}.jpeg",
-            ]
-            # fmt: on
+        return finished_imgs
 
-        # construct list of grouped images
+    def _preview_groups(self) -> dict[str, list[str]]:
+        """Group the exported .jpeg textures by map, collecting the UDIMs of
+        each map together"""
         img_list: dict[str, list[str]] = {}
         for imgs in self.imgs_by_tex_set:
             for img in imgs:
@@ -179,17 +509,97 @@ class TexConverter:
                     if key not in img_list:
                         img_list[key] = []
                     img_list[key].append(img)
+        return img_list
 
-        cmdlines = [
-            jpeg_cmd(Path(root), sorted(imgs)) for root, imgs in img_list.items()
-        ]
+    def _preview_out_path(self, root: Path) -> Path:
+        img_name = re.search(r"^(.*_)(.+)$", root.name)
+        assert img_name is not None
+        name_base, color_space = img_name.group(1, 2)
+        suffix = "sRGB" if color_space == "sRGB-Texture" else "Linear"
+        return self.preview_path / f"{name_base}{suffix}.jpeg"
 
-        finished_imgs = self._wait_and_check_cmds(cmdlines)
+    @staticmethod
+    def _preview_grid(count: int) -> tuple[int, int]:
+        """Get the (columns, rows) of the mosaic grid for `count` tiles"""
+        grid_height = int(floor(sqrt(count)))
+        grid_base = int(grid_height + ceil(count / grid_height - grid_height))
+        return grid_base, grid_height
+
+    def _mosaic_previews(self, img_groups: dict[str, list[str]]) -> list[Path]:
+        """Build the preview mosaics in-process. Tiles are decoded in a thread
+        pool and box filtered straight into the output image, so the full
+        resolution mosaic is never held in memory"""
+        finished_imgs: list[Path] = []
+        with ThreadPoolExecutor() as pool:
+            for root, imgs in img_groups.items():
+                if self.cancelled:
+                    raise TexConversionCancelled
+                out_path = self._preview_out_path(Path(root))
+                try:
+                    self._write_mosaic(pool, sorted(imgs), out_path)
+                except (OSError, ValueError) as e:
+                    log.error(f"Could not build preview mosaic {out_path}: {e}")
+                    continue
+                log.debug(f"Successfully converted {out_path}")
+                finished_imgs.append(out_path)
+        return finished_imgs
 
-        if len(finished_imgs) != len(cmdlines):
-            raise TexConversionError("Not all jpeg textures were converted")
+    @staticmethod
+    def _write_mosaic(
+        pool: ThreadPoolExecutor, imgs: typing.Sequence[str], out_path: Path
+    ) -> None:
+        """Lay `imgs` out in the same grid as `oiiotool --mosaic`, shrink the
+        grid back down to the size of one tile, and write it as a JPEG"""
+        out = TexConverter._build_mosaic(pool, imgs)
+        Image.fromarray(out, "RGB").save(out_path, quality=95)
 
-        return finished_imgs
+    @staticmethod
+    def _build_mosaic(
+        pool: ThreadPoolExecutor, imgs: typing.Sequence[str]
+    ) -> np.ndarray:
+        """The box filtered mosaic of `imgs`, the size of one tile"""
+
+        def decode(img: str) -> np.ndarray:
+            with Image.open(img) as im:
+                return np.asarray(im.convert("RGB"))
+
+        cols, rows = TexConverter._preview_grid(len(imgs))
+        acc: np.ndarray | None = None
+
+        futures = {pool.submit(decode, img): idx for idx, img in enumerate(imgs)}
+        for future in as_completed(futures):
+            tile = future.result()
+            if acc is None:
+                acc = np.zeros(tile.shape, dtype=np.uint32)
+            elif tile.shape != acc.shape:
+                raise ValueError("UDIM tiles are not all the same resolution")
+
+            # position of the tile's top left corner in the full mosaic. Drop
+            # the future so the decoded tile can be freed
+            row, col = divmod(futures.pop(future), cols)
+            height, width = tile.shape[:2]
+            TexConverter._box_accumulate(
+                acc, tile, row * height, col * width, rows, cols
+            )
+
+        assert acc is not None
+        count = rows * cols
+        return ((acc + count // 2) // count).astype(np.uint8)
+
+    @staticmethod
+    def _box_accumulate(
+        acc: np.ndarray, tile: np.ndarray, y0: int, x0: int, fy: int, fx: int
+    ) -> None:
+        """Sum the pixels of a tile placed at (`y0`, `x0`) in the mosaic into
+        the `fy` x `fx` boxes of `acc` that they fall in"""
+        ys = (np.arange(tile.shape[0]) + y0) // fy
+        xs = (np.arange(tile.shape[1]) + x0) // fx
+        y_starts = np.flatnonzero(np.diff(ys, prepend=-1))
+        x_starts = np.flatnonzero(np.diff(xs, prepend=-1))
+
+        summed = np.add.reduceat(tile, y_starts, axis=0, dtype=np.uint32)
+        summed = np.add.reduceat(summed, x_starts, axis=1, dtype=np.uint32)
+        acc[ys[0] : ys[-1] + 1, xs[0] : xs[-1] + 1] += summed
 
     @staticmethod
     def _img_dims(img: str) -> tuple[str, str]:
@@ -207,51 +617,337 @@ class TexConverter:
         matches = img_dims.group(1, 2)
         return (matches[0], matches[1])
 
-    @staticmethod
-    def _wait_and_check_cmds(
-        cmds: typing.Sequence[list[str]], batch_size: int = 18, skip_check: bool = False
-    ) -> list[Path]:
-        """Wait for list of processes to finish and print them to the debug log"""
-
-        batched_cmds = (
-            cmds[i : i + batch_size] for i in range(0, len(cmds), batch_size)
-        )
+    def _link_from_store(self, src: str, chain: list[ConversionJob]) -> None:
+        """Key the output of a chain of jobs by the contents of its source
+        image and the commands' arguments. If the store already has it, link
+        it into place and mark the chain as finished without running it.
+        Runs in `_store_pool` before the chain is started"""
+        assert self.store is not None
+
+        try:
+            key = hashlib.sha1(file_digest(src).encode())
+        except OSError as e:
+            log.warning(f"Could not hash {src}, converting without the store: {e}")
+            return
+        for job in chain:
+            # leave out paths so the same conversion matches across variants
+            args = [a for a in job.cmd[1:] if "/" not in a and "\\" not in a]
+            key.update("\0".join([job.tool, *args]).encode())
+
+        out_job = chain[-1]
+        out_job.store_key = key.hexdigest()
+        stored = self._store_path(out_job)
+        if not stored.exists():
+            return
+
+        try:
+            link_or_copy(stored, out_job.output)
+        except OSError as e:
+            log.warning(f"Could not link {out_job.output} from the store: {e}")
+            return
+
+        log.debug(f"Reusing {stored} for {out_job.output}")
+        now = time.time()
+        with self._lock:
+            if chain[0].status is not JobStatus.QUEUED:
+                # cancelled
+                return
+            for job in chain:
+                job.start_time = job.end_time = now
+                job.status = JobStatus.FINISHED
+                self._emit(job)
+
+    def _store_path(self, job: ConversionJob) -> Path:
+        assert self.store is not None and job.store_key is not None
+        return self.store / job.store_key[:2] / f"{job.store_key}{job.output.suffix}"
+
+    def _add_to_store(self, job: ConversionJob) -> None:
+        """Move a freshly converted output into the store and link it back"""
+        stored = self._store_path(job)
+        try:
+            stored.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(job.output, stored)
+            link_or_copy(stored, job.output)
+        except OSError as e:
+            log.warning(f"Could not add {job.output} to the store: {e}")
+
+    def prune_store(self, tex_dirs: typing.Iterable[Path]) -> list[Path]:
+        """Remove the store entries that no output links to anymore. Outputs
+        are hardlinks to their entry, except where the filesystem only
+        supports symlinks, so `tex_dirs` (every directory outputs are linked
+        into) are checked for symlinks to the store. Returns the removed
+        paths"""
+        assert self.store is not None
+        if not self.store.is_dir():
+            return []
+
+        linked: set[Path] = set()
+        for tex_dir in tex_dirs:
+            if not tex_dir.is_dir():
+                continue
+            for file in tex_dir.iterdir():
+                if file.is_symlink():
+                    linked.add(file.resolve())
+
+        removed: list[Path] = []
+        cutoff = time.time() - self.STORE_PRUNE_AGE
+        for prefix_dir in self.store.iterdir():
+            for stored in prefix_dir.iterdir():
+                try:
+                    st = stored.stat()
+                    if (
+                        st.st_nlink > 1
+                        or st.st_mtime > cutoff
+                        or stored.resolve() in linked
+                    ):
+                        continue
+                    stored.unlink()
+                except OSError as e:
+                    log.warning(f"Could not prune {stored} from the store: {e}")
+                    continue
+                removed.append(stored)
+            try:
+                prefix_dir.rmdir()
+            except OSError:
+                # not empty
+                pass
 
-        finished_imgs: list[Path] = []
+        log.info(f"Pruned {len(removed)} unused textures from {self.store}")
+        return removed
 
-        while batch := next(batched_cmds, None):
-            start_time = time.time()
+    @staticmethod
+    def _job(cmd: list[str], **kwargs) -> ConversionJob:
+        """Create a job for a command that writes to its last argument"""
+        return ConversionJob(cmd, Path(cmd[-1]), **kwargs)
+
+    def wait(self, jobs: typing.Iterable[ConversionJob]) -> list[Path]:
+        """Block until the jobs are done, forwarding progress to
+        `progress_callback`. Returns the outputs of the successfully checked
+        jobs"""
+        jobs = list(jobs)
+        while not (all(job.done for job in jobs) and self._events.empty()):
+            try:
+                event = self._events.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                with self._lock:
+                    event = self._progress(None)
+            if self.progress_callback:
+                self.progress_callback(event)
+
+        if self.cancelled:
+            raise TexConversionCancelled
+
+        return [
+            job.output for job in jobs if job.check and job.status is JobStatus.FINISHED
+        ]
 
-            procs = [
-                subprocess.Popen(
-                    cmd,
-                    env=os.environ,
-                    startupinfo=silent_startupinfo(),
-                    stderr=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
+    def poll(self) -> None:
+        """Forward any pending progress events without blocking"""
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                return
+            if self.progress_callback:
+                self.progress_callback(event)
+
+    def _submit(self, jobs: typing.Iterable[ConversionJob]) -> None:
+        """Queue the jobs and make sure the worker thread is running"""
+        with self._lock:
+            for job in jobs:
+                self._jobs.append(job)
+                self._emit(job)
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._schedule, name="TexConverter", daemon=True
                 )
-                for cmd in batch
-            ]
-
-            for p in procs:
-                p.wait()
-                if log.isEnabledFor(logging.DEBUG):
-                    if p.stdout and (stdout := p.stdout.read().decode("utf-8")):
-                        log.debug(stdout)
-                    if p.stderr and (stderr := p.stderr.read().decode("utf-8")):
-                        log.debug(stderr)
-
-                if skip_check:
-                    continue
-
-                img = Path(cast(str, p.args[-1]))  # type: ignore[index]
+                self._worker.start()
+
+    def _schedule(self) -> None:
+        """Worker thread. Keeps up to `profile.max_procs` jobs running until
+        there is nothing left to run"""
+        running: list[ConversionJob] = []
+        try:
+            while True:
+                finished: list[ConversionJob] = []
+                with self._lock:
+                    if self.cancelled:
+                        self._abort(running)
+                        self._worker = None
+                        return
+
+                    for job in [j for j in running if self._reap(j)]:
+                        running.remove(job)
+                        self._finish(job)
+                        finished.append(job)
+
+                    for job in self._jobs:
+                        if len(running) >= self.profile.max_procs:
+                            break
+                        if job.status is not JobStatus.QUEUED:
+                            continue
+                        if job.depends_on and not job.depends_on.done:
+                            continue
+                        if job.store_lookup and not job.store_lookup.done():
+                            continue
+                        self._start(job)
+                        running.append(job)
+
+                    # queued jobs may still be waiting on a store lookup
+                    done = not running and not any(
+                        job.status is JobStatus.QUEUED for job in self._jobs
+                    )
+                    if done:
+                        self._worker = None
+
+                # the history may be on a slow disk. Don't block progress on it
+                if self.history:
+                    self.history.record(finished, self.profile)
+                if done:
+                    return
+
+                time.sleep(self.POLL_INTERVAL)
+        except Exception:
+            log.exception("Texture conversion worker failed")
+            with self._lock:
+                for job in self._jobs:
+                    if not job.done:
+                        job.status = JobStatus.FAILED
+                        self._emit(job)
+                self._worker = None
+
+    def _start(self, job: ConversionJob) -> None:
+        if job.store_key:
+            # the old output may be linked to the store. Don't write through it
+            job.output.unlink(missing_ok=True)
+
+        # only keep the output around if it will be logged
+        output = subprocess.PIPE if log.isEnabledFor(logging.DEBUG) else None
+        job.start_time = time.time()
+        job.proc = subprocess.Popen(
+            job.cmd,
+            env=os.environ,
+            startupinfo=silent_startupinfo(),
+            stderr=output or subprocess.DEVNULL,
+            stdout=output or subprocess.DEVNULL,
+        )
+        job.status = JobStatus.STARTED
+        self._emit(job)
 
-                # check file has been touched recently
-                if start_time < img.stat().st_mtime:
-                    log.debug(f"Successfully converted {img}")
-                    finished_imgs.append(img)
+    @staticmethod
+    def _reap(job: ConversionJob) -> bool:
+        """Check if the job's process has exited, collecting its CPU time and
+        peak memory where the platform allows it"""
+        assert job.proc is not None
+        if not hasattr(os, "wait4"):
+            # Windows. The history gets no cpu_time or peak_rss
+            if job.proc.poll() is None:
+                return False
+            log.debug(f"No resource usage for {job.tool} on {sys.platform}")
+            return True
+
+        try:
+            pid, status, rusage = os.wait4(job.proc.pid, os.WNOHANG)
+        except ChildProcessError:
+            # already reaped
+            return job.proc.poll() is not None
+        if pid == 0:
+            return False
+
+        job.proc.returncode = os.waitstatus_to_exitcode(status)
+        job.cpu_time = rusage.ru_utime + rusage.ru_stime
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        job.peak_rss = rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        return True
+
+    def _finish(self, job: ConversionJob) -> None:
+        assert job.proc is not None
+        job.end_time = time.time()
+        if job.proc.stdout:
+            stdout, stderr = job.proc.communicate()
+            if stdout:
+                log.debug(stdout.decode("utf-8"))
+            if stderr:
+                log.debug(stderr.decode("utf-8"))
+
+        # check file has been touched since the job started
+        if not job.check or (
+            job.output.exists() and job.start_time < job.output.stat().st_mtime
+        ):
+            log.debug(f"Successfully converted {job.output}")
+            if job.store_key:
+                self._add_to_store(job)
+            job.status = JobStatus.FINISHED
+        else:
+            log.debug(f"Failed to convert {job.output}")
+            job.status = JobStatus.FAILED
+        self._emit(job)
+
+    def _abort(self, running: list[ConversionJob]) -> None:
+        """Terminate the running jobs, cancel the queued ones and roll back
+        any partially written files"""
+        for job in running:
+            assert job.proc is not None
+            job.proc.terminate()
+        for job in running:
+            assert job.proc is not None
+            try:
+                job.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                job.proc.kill()
+                job.proc.wait()
+            job.output.unlink(missing_ok=True)
+
+        for file in self.tex_path.glob("*.temp.tex"):
+            file.unlink(missing_ok=True)
+
+        for job in self._jobs:
+            if not job.done:
+                job.status = JobStatus.CANCELLED
+                self._emit(job)
+
+    def _emit(self, job: ConversionJob) -> None:
+        """Queue a progress event for `job`. Must hold `_lock`"""
+        self._events.put(self._progress(job))
+
+    def _progress(self, job: ConversionJob | None) -> ProgressEvent:
+        """Snapshot the progress of all jobs. Must hold `_lock`"""
+        finished = [j for j in self._jobs if j.status is JobStatus.FINISHED]
+        failed = sum(j.done for j in self._jobs) - len(finished)
+        remaining = len(self._jobs) - len(finished) - failed
+
+        eta: float | None = None
+        if remaining == 0:
+            eta = 0.0
+        else:
+            # estimate each remaining job from this run's timings, falling
+            # back to the timing history
+            run_times: dict[str, list[float]] = {}
+            for j in finished:
+                run_times.setdefault(j.tool, []).append(j.duration)
+            estimates = [
+                sum(t) / len(t)
+                if (t := run_times.get(j.tool))
+                else self._historical_times.get(j.tool)
+                for j in self._jobs
+                if not j.done
+            ]
+            if known := [e for e in estimates if e is not None]:
+                eta = (
+                    sum(known)
+                    / len(known)
+                    * remaining
+                    / min(remaining, self.profile.max_procs)
+                )
 
-        return finished_imgs
+        return ProgressEvent(
+            job=job,
+            status=job.status if job else None,
+            finished=len(finished),
+            failed=failed,
+            total=len(self._jobs),
+            eta=eta,
+        )
 
     def _debug_out(self, func: typing.Callable[..., RT]) -> typing.Callable[..., RT]:
         """Decorator to debug print the output of the function"""
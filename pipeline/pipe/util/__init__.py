@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from .filemanager import FileManager
-from .playblaster import Playblaster
+from .fileops import file_digest, link_or_copy
+from .playblaster import Playblaster, PlayblastResult
 from .struct import dict_index, dotdict
 
 import logging
@@ -92,9 +93,12 @@ __all__ = [
     "checkbox_callback_helper",
     "dict_index",
     "dotdict",
+    "file_digest",
+    "link_or_copy",
     "log_errors",
     "reload_pipe",
     "silent_startupinfo",
     "FileManager",
     "Playblaster",
+    "PlayblastResult",
 ]
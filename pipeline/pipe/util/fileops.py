@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    import typing
+
+log = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 2**20
+# from linux/fs.h
+_FICLONE = 0x40049409
+
+
+def file_digest(path: Path | str, algorithm: str = "sha1") -> str:
+    """Hex digest of a file's contents, read in chunks"""
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    """Atomically make `dst` a hardlink to `src`. Falls back to a relative
+    symlink if hardlinks aren't supported, and to a copy if neither are"""
+    try:
+        if dst.samefile(src):
+            return
+    except OSError:
+        pass
+
+    tmp = _tmp_path(dst)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        try:
+            os.symlink(os.path.relpath(src, dst.parent), tmp)
+        except OSError:
+            log.debug(f"Could not link {dst} to {src}, copying")
+            shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+class FanOutError(OSError):
+    """Raised by `fan_out` once every copy has been attempted, if any of
+    them failed"""
+
+    written: list[Path]
+    errors: dict[Path, OSError]
+
+    def __init__(self, written: list[Path], errors: dict[Path, OSError]) -> None:
+        super().__init__(
+            f"Could not write {len(errors)} of {len(written) + len(errors)} "
+            f"copies: " + "; ".join(f"{p}: {e}" for p, e in errors.items())
+        )
+        self.written = written
+        self.errors = errors
+
+
+def fan_out(src: Path, dsts: typing.Iterable[Path]) -> list[Path]:
+    """Atomically put a copy of `src` at each of `dsts`, returning the paths
+    that were written.
+
+    The file is only copied once per filesystem and verified against the
+    source's size and checksum. The other destinations on the same
+    filesystem are reflinked or hardlinked to that copy. Copies to different
+    filesystems run in parallel. Raises `FanOutError` after they finish if
+    any destination couldn't be written"""
+    by_device: dict[int, list[Path]] = defaultdict(list)
+    for dst in dsts:
+        by_device[dst.parent.stat().st_dev].append(dst)
+    src_device = src.stat().st_dev
+
+    # only copies to other filesystems are verified, so the source is hashed
+    # the first time one needs it
+    digest_lock = threading.Lock()
+    src_digest: list[str] = []
+
+    def digest() -> str:
+        with digest_lock:
+            if not src_digest:
+                src_digest.append(file_digest(src))
+            return src_digest[0]
+
+    def inner(device: int, group: list[Path]) -> tuple[list[Path], dict[Path, OSError]]:
+        first, *rest = group
+        try:
+            if device == src_device:
+                _clone(src, first)
+            else:
+                _verified_copy(src, first, digest)
+        except OSError as e:
+            # the rest of the group would have been linked to this copy
+            return [], dict.fromkeys(group, e)
+
+        written = [first]
+        errors: dict[Path, OSError] = {}
+        for dst in rest:
+            try:
+                _clone(first, dst)
+                written.append(dst)
+            except OSError as e:
+                errors[dst] = e
+        return written, errors
+
+    written: list[Path] = []
+    errors: dict[Path, OSError] = {}
+    with ThreadPoolExecutor(max(1, len(by_device))) as pool:
+        futures = [pool.submit(inner, dev, group) for dev, group in by_device.items()]
+        for future in futures:
+            group_written, group_errors = future.result()
+            written += group_written
+            errors.update(group_errors)
+
+    if errors:
+        raise FanOutError(written, errors)
+    return written
+
+
+def write_json_atomic(path: Path, data: typing.Any) -> None:
+    """Write `data` as JSON so readers never see a partially written file"""
+    tmp = _tmp_path(path)
+    tmp.write_text(json.dumps(data, indent=4))
+    os.replace(tmp, path)
+
+
+@contextmanager
+def file_lock(
+    path: Path, timeout: float = 30.0, stale: float = 120.0
+) -> typing.Generator[None, None, None]:
+    """Hold `<path>.lock` so other processes (and machines sharing the
+    filesystem) don't update `path` at the same time. Locks older than
+    `stale` seconds are assumed to be left over from a crash and reclaimed.
+    The lock file names its holder, so a holder whose lock was reclaimed
+    never removes the lock that replaced it"""
+    lock = path.with_name(path.name + ".lock")
+    owner = f"{socket.gethostname()} {os.getpid()} {uuid.uuid4().hex}"
+    deadline = time.time() + timeout
+    while not _create_lock(lock, owner):
+        try:
+            holder = lock.read_text()
+            if time.time() - lock.stat().st_mtime > stale:
+                if _remove_lock(lock, holder):
+                    log.warning(f"Removed stale lock {lock} held by {holder!r}")
+                continue
+        except FileNotFoundError:
+            continue
+        if time.time() > deadline:
+            raise TimeoutError(f"Timed out waiting for {lock}")
+        time.sleep(0.1)
+
+    try:
+        yield
+    finally:
+        if not _remove_lock(lock, owner):
+            log.warning(f"{lock} was reclaimed by another process while held")
+
+
+def _create_lock(lock: Path, owner: str) -> bool:
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    try:
+        os.write(fd, owner.encode())
+    finally:
+        os.close(fd)
+    return True
+
+
+def _remove_lock(lock: Path, owner: str) -> bool:
+    """Remove `lock` if `owner` holds it. It's renamed out of the way before
+    it's checked, so a lock created by someone else in the meantime is put
+    back instead of removed"""
+    aside = lock.with_name(f".{lock.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        os.rename(lock, aside)
+    except FileNotFoundError:
+        return False
+    try:
+        holder = aside.read_text()
+        if holder == owner:
+            return True
+        if not _create_lock(lock, holder):
+            log.warning(f"Could not give {lock} back to {holder!r}")
+        return False
+    finally:
+        aside.unlink(missing_ok=True)
+
+
+def _tmp_path(dst: Path) -> Path:
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.unlink(missing_ok=True)
+    return tmp
+
+
+def _clone(src: Path, dst: Path) -> None:
+    """Atomically make `dst` a reflink (copy-on-write clone) or hardlink of
+    `src` on the same filesystem, falling back to a plain copy"""
+    tmp = _tmp_path(dst)
+    try:
+        _reflink(src, tmp)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    if fcntl is None:
+        raise OSError("Reflinks are not supported on this platform")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+
+
+def _verified_copy(src: Path, dst: Path, src_digest: typing.Callable[[], str]) -> None:
+    """Copy `src` to a temporary name next to `dst`, check it arrived intact
+    and move it into place. `src_digest` returns the checksum of `src`"""
+    tmp = _tmp_path(dst)
+    try:
+        shutil.copyfile(src, tmp)
+        if tmp.stat().st_size != src.stat().st_size or file_digest(tmp) != src_digest():
+            raise OSError(f"Copy of {src} to {dst} is corrupt")
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
@@ -0,0 +1,229 @@
+"""Synthetic playblaster for exercising and timing `Playblaster` without a
+DCC. Run with `python -m pipe.util.playblastbench`"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from PIL import Image
+
+from pipe.struct.db import Shot
+
+from .playblaster import Playblaster, PlayblastResult
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+
+log = logging.getLogger(__name__)
+
+
+class SyntheticPlayblaster(Playblaster):
+    """Playblaster that generates a moving test pattern instead of capturing
+    a viewport. Supports both the PNG and streaming paths"""
+
+    out_paths: dict[Playblaster.PRESET, list[Path | str]]
+    stream: bool
+    tails: tuple[int, int]
+
+    _background: np.ndarray
+
+    def __init__(
+        self,
+        out_paths: dict[Playblaster.PRESET, list[Path | str]],
+        stream: bool = False,
+        tails: tuple[int, int] = (0, 0),
+    ) -> None:
+        super().__init__()
+        self.out_paths = out_paths
+        self.stream = stream
+        self.tails = tails
+
+        # fixed noisy gradient, so the frames compress like real images
+        width, height = self.RESOLUTION
+        rng = np.random.default_rng(0)
+        gradient = np.linspace(0, 192, width, dtype=np.float32)
+        self._background = (
+            np.broadcast_to(gradient[None, :, None], (height, width, 3))
+            + rng.integers(0, 32, (height, width, 3))
+        ).astype(np.uint8)
+
+    def _frames(self) -> range:
+        return self._frame_range(self.tails)
+
+    def _frame(self, frame: int) -> np.ndarray:
+        img = self._background.copy()
+        width = self.RESOLUTION[0]
+        x = (frame * 16) % (width - 64)
+        img[:, x : x + 64] = 255
+        return img
+
+    def _write_images(self, path: str, frames: Sequence[int] | None = None) -> None:
+        for frame in self._frames() if frames is None else frames:
+            Image.fromarray(self._frame(frame)).save(f"{path}.{frame:04d}.png")
+
+    def _frame_keys(self, frames: range) -> list[str]:
+        # the pattern only depends on the frame number
+        return [str(frame) for frame in frames]
+
+    def _iter_frames(self) -> Iterator[bytes]:
+        for frame in self._frames():
+            yield self._frame(frame).tobytes()
+
+    def playblast(self, shot: Shot | None = None) -> list[PlayblastResult]:
+        shot = shot or synthetic_shot()
+        result = PlayblastResult(shot.code)
+        start = time.time()
+        with self(shot):
+            encode = self._capture(self.out_paths, self.tails, stream=self.stream)
+        result.capture_time = time.time() - start
+        return [result.encode(encode)]
+
+
+def synthetic_shot(frames: int = 120) -> Shot:
+    return Shot(
+        code="SYNTH",
+        id=0,
+        assets=[],
+        cut_in=1001,
+        cut_out=1000 + frames,
+        cut_duration=frames,
+        sequence=None,
+        set=None,
+    )
+
+
+def bench(
+    presets: list[Playblaster.PRESET], frames: int, out_dir: Path
+) -> dict[str, float]:
+    """Time a playblast of a synthetic shot to `presets` with and without
+    streaming"""
+    shot = synthetic_shot(frames)
+    timings: dict[str, float] = {}
+    for stream in (False, True):
+        mode = "stream" if stream else "png"
+        out_paths: dict[Playblaster.PRESET, list[Path | str]] = {
+            preset: [out_dir / f"{mode}_{preset.name}"] for preset in presets
+        }
+        start = time.time()
+        for result in SyntheticPlayblaster(out_paths, stream=stream).playblast(shot):
+            if result.error:
+                raise result.error
+        timings[mode] = time.time() - start
+    return timings
+
+
+def bench_presets(
+    presets: list[Playblaster.PRESET], frames: int, out_dir: Path
+) -> dict[str, tuple[float, int]]:
+    """Time encoding a synthetic shot to each preset on its own. Frames are
+    streamed so the time is dominated by the encode. Returns the seconds and
+    output size of each preset"""
+    shot = synthetic_shot(frames)
+    timings: dict[str, tuple[float, int]] = {}
+    for preset in presets:
+        out_path = out_dir / f"preset_{preset.name}"
+        start = time.time()
+        (result,) = SyntheticPlayblaster({preset: [out_path]}, stream=True).playblast(
+            shot
+        )
+        if result.error:
+            raise result.error
+        timings[preset.name] = (time.time() - start, result.outputs[0].stat().st_size)
+    return timings
+
+
+def bench_frame_keys(scene: Path, repeat: int = 3) -> dict[str, tuple[float, int]]:
+    """Time hashing the animation of a Maya scene for the frame cache, over
+    every animation curve and over only the ones that drive something
+    visible. Has to run in mayapy. Returns the best seconds of `repeat` runs
+    and the number of distinct frame keys of each"""
+    import maya.cmds as mc
+
+    from pipe.m.playblast.playblaster import MPlayblaster
+    from pipe.m.playblast.struct import MPlayblastConfig, dummy_shot
+
+    mc.file(str(scene), open=True, force=True, prompt=False)
+    cut_in = int(mc.playbackOptions(query=True, minTime=True))  # type: ignore[arg-type]
+    cut_out = int(mc.playbackOptions(query=True, maxTime=True))  # type: ignore[arg-type]
+
+    playblaster = MPlayblaster().configure(
+        MPlayblastConfig(
+            builtin_huds=[], custom_huds=[], lighting=False, shadows=False, shots=[]
+        )
+    )
+    playblaster._extra_kwargs = {}
+    timings: dict[str, tuple[float, int]] = {}
+    with playblaster(dummy_shot("BENCH", cut_in, cut_out, cut_out - cut_in + 1)):
+        frames = playblaster._frame_range((0, 0))
+        for name, visible_only in (("all", False), ("visible", True)):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                keys = playblaster._frame_keys(frames, visible_only)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = (best, len(set(keys)))
+    return timings
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument(
+        "--presets",
+        nargs="*",
+        choices=[p.name for p in Playblaster.PRESET],
+        default=[p.name for p in Playblaster.PRESET],
+    )
+    parser.add_argument("--out", type=Path, help="Keep the videos in this folder")
+    parser.add_argument(
+        "--per-preset",
+        action="store_true",
+        help="Time each preset's encode on its own instead of comparing "
+        "streaming to PNGs",
+    )
+    parser.add_argument(
+        "--frame-keys",
+        type=Path,
+        metavar="SCENE",
+        help="Time hashing the animation of a Maya scene for the frame cache "
+        "instead. Run in mayapy: __main__.py maya --python -- -m "
+        "pipe.util.playblastbench --frame-keys SCENE",
+    )
+    args = parser.parse_args(argv)
+
+    if args.frame_keys:
+        for name, (seconds, unique) in bench_frame_keys(args.frame_keys).items():
+            print(f"{name:<8}{seconds:>8.3f}s{unique:>8} distinct frames")
+        return
+
+    presets = [Playblaster.PRESET[name] for name in args.presets]
+    with tempfile.TemporaryDirectory(prefix="playblastbench_") as tmp:
+        out_dir = args.out or Path(tmp)
+        if args.per_preset:
+            preset_timings = bench_presets(presets, args.frames, out_dir)
+        else:
+            timings = bench(presets, args.frames, out_dir)
+
+    if args.per_preset:
+        print(f"{args.frames} frames per preset")
+        for name, (seconds, size) in preset_timings.items():
+            print(
+                f"{name:<12}{seconds:>8.1f}s{args.frames / seconds:>8.1f} fps"
+                f"{size / 2**20:>8.1f} MB"
+            )
+        return
+
+    print(f"{args.frames} frames to {', '.join(args.presets)}")
+    for mode, seconds in timings.items():
+        print(f"{mode:<8}{seconds:>8.1f}s{args.frames / seconds:>8.1f} fps")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,20 +1,39 @@
 from __future__ import annotations
 
 import ffmpeg  # type: ignore[import-untyped]
+import getpass
+import json
 import logging
 import os
+import platform
+import queue
 import shutil
+import tempfile
+import threading
+import time
 
 from abc import ABCMeta, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import datetime
 from enum import Enum
 from pathlib import Path
 
 from typing import TYPE_CHECKING
 
+from .fileops import (
+    FanOutError,
+    fan_out,
+    file_lock,
+    link_or_copy,
+    write_json_atomic,
+)
+
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Sequence
     from typing import Any
+
     from typing_extensions import Self
+
     from pipe.struct.db import Shot
 
 
@@ -30,6 +49,38 @@ class FFMpegPreset:
         return hash(frozenset(self.out_kwargs.items()))
 
 
+@dataclass
+class PlayblastResult:
+    """Outcome of playblasting one shot"""
+
+    shot: str
+    capture_time: float = 0.0
+    encode_time: float = 0.0
+    outputs: list[Path] = field(default_factory=list)
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def encode(self, encode: Callable[[], list[Path]]) -> PlayblastResult:
+        """Run the encode step returned by `Playblaster._capture`, recording
+        its time and any error instead of raising it"""
+        start = time.time()
+        try:
+            self.outputs = encode()
+        except FanOutError as e:
+            log.error(f"Failed to copy {self.shot}: {e}")
+            self.outputs = e.written
+            self.error = e
+        except Exception as e:
+            log.exception(f"Failed to encode {self.shot}")
+            self.error = e
+        finally:
+            self.encode_time = time.time() - start
+        return self
+
+
 class Playblaster(metaclass=ABCMeta):
     """Parent class for creating playblasters. Uses FFmpeg to encode videos"""
 
@@ -37,6 +88,28 @@ class Playblaster(metaclass=ABCMeta):
     _in_context: bool
 
     FR = 24
+    RESOLUTION = (1920, 816)
+    # frames buffered between capture and encode when streaming
+    STREAM_QUEUE_SIZE = 32
+    # per-directory listing of the playblasts in it
+    INDEX_NAME = "playblasts.json"
+    # used to estimate the scratch space a playblast needs. PNG and encoded
+    # sizes are fractions of the raw rgb24 frame size, on the high side
+    PNG_RATIO = 0.6
+    VIDEO_RATIO = 0.1
+    # free space to leave on the scratch disk
+    SCRATCH_RESERVE = 2**30
+    # seconds before a scratch dir is assumed to be left over from a crash
+    STALE_SCRATCH = 24 * 60 * 60
+    # seconds to wait for another playblast of the shot to finish with the
+    # frame cache before capturing without it, and before its lock is
+    # assumed to be left over from a crash
+    CACHE_LOCK_TIMEOUT = 5.0
+    CACHE_LOCK_STALE = 60 * 60
+    # shots' frame caches are evicted once unused for this many seconds, and
+    # least recently used first while they take up more than this many bytes
+    STALE_FRAME_CACHE = 7 * 24 * 60 * 60
+    FRAME_CACHE_MAX_SIZE = 50 * 2**30
 
     class PRESET(FFMpegPreset, Enum):
         EDIT_SQ = (
@@ -67,13 +140,51 @@ class Playblaster(metaclass=ABCMeta):
                 "crf": 20,
             },
         )
+        # quick review encodes. Takes a fraction of the time of WEB, with
+        # a higher CRF to keep the file size close
+        WEB_DAILIES = (
+            "mp4",
+            {
+                "vcodec": "libx264",
+                "preset": "veryfast",
+                "tune": "animation",
+                "crf": 23,
+            },
+        )
 
     def __init__(self) -> None:
         pass
 
     @abstractmethod
-    def _write_images(self, path: str) -> None:
-        pass
+    def _write_images(self, path: str, frames: Sequence[int] | None = None) -> None:
+        """Write the frames of the shot to `<path>.####.png`. If `frames` is
+        given only those frames need to be written"""
+
+    def _frame_range(self, tails: tuple[int, int]) -> range:
+        """The frames written by `_write_images`"""
+        return range(
+            int(self._shot.cut_in) - tails[0], int(self._shot.cut_out) + tails[1] + 1
+        )
+
+    def _frame_keys(self, frames: range) -> list[str] | None:
+        """Optionally implemented to support the frame cache. Returns a hash
+        of everything that affects the image of each frame"""
+        return None
+
+    def _metadata(self) -> dict[str, Any]:
+        """Optionally implemented to add DCC specific details (source file,
+        camera, HUDs...) to the metadata written next to each video"""
+        return {}
+
+    # optionally implemented to support streaming playblasts. Yields each
+    # frame as packed rgb24 bytes of size `RESOLUTION`, top row first
+    _iter_frames: Callable[[], Iterator[bytes]] | None = None
+
+    @property
+    def can_stream(self) -> bool:
+        """Whether frames can be streamed in this session. Streaming
+        playblasts fall back to `_write_images` when they can't"""
+        return self._iter_frames is not None
 
     def __enter__(self) -> Self:
         self._in_context = True
@@ -90,7 +201,33 @@ class Playblaster(metaclass=ABCMeta):
         self,
         out_paths: dict[PRESET, list[Path | str]] | None = None,
         tails: tuple[int, int] = (0, 0),
-    ) -> None:
+        stream: bool = False,
+        cache: bool = False,
+    ) -> list[Path]:
+        """Capture the shot and encode it to every preset in `out_paths`.
+        Returns the paths of the finished videos.
+
+        If `stream` is set, frames from `_iter_frames` are piped straight to
+        FFmpeg instead of being written to temporary PNGs. If `cache` is set,
+        the PNGs are kept between playblasts and only frames whose
+        `_frame_keys` changed are captured again"""
+        return self._capture(out_paths, tails, stream, cache)()
+
+    def _capture(
+        self,
+        out_paths: dict[PRESET, list[Path | str]] | None = None,
+        tails: tuple[int, int] = (0, 0),
+        stream: bool = False,
+        cache: bool = False,
+        stream_fallback: bool = True,
+    ) -> Callable[[], list[Path]]:
+        """Capture the shot, returning a function that encodes and copies the
+        videos to `out_paths`. The returned function doesn't touch the DCC, so
+        it can run on another thread while the next shot is captured.
+
+        If there isn't enough scratch space for the PNGs the frames are
+        streamed instead, unless `stream_fallback` is unset or the subclass
+        can't stream"""
         if not self._in_context:
             raise RuntimeError("_do_playblast not called from within context self")
 
@@ -98,58 +235,381 @@ class Playblaster(metaclass=ABCMeta):
             out_paths = {}
 
         tempdir = Path(os.getenv("TMPDIR", os.getenv("TEMP", "tmp"))).resolve()
+        self._remove_stale_scratch(tempdir)
+        cache_root = tempdir / "lnd_pb_cache"
+        self._evict_frame_cache(cache_root, self._shot.code)
+
+        start_frame = int(self._shot.cut_in) - tails[0]
+        timecode = "00:00:{:02}:{:02}".format(
+            start_frame // self.FR,
+            start_frame % self.FR,
+        )
+        frames = self._frame_range(tails)
+        info: dict[str, Any] = {
+            "shot": self._shot.code,
+            "frame_range": [frames[0], frames[-1]],
+            "start_frame": start_frame,
+            "fps": self.FR,
+            "timecode": timecode,
+            "resolution": list(self.RESOLUTION),
+            **self._metadata(),
+        }
 
+        # make sure the capture won't fill up the disk part way through
+        images_size, videos_size = self._estimate_scratch(frames, out_paths)
+        free = shutil.disk_usage(tempdir).free - self.SCRATCH_RESERVE
+        if videos_size > free:
+            raise OSError(f"Not enough space in {tempdir} to encode {self._shot.code}")
+        if stream and not self.can_stream:
+            log.warning(f"Can't stream {self._shot.code}, writing frames instead")
+            stream = False
+        if not stream and images_size + videos_size > free:
+            if not stream_fallback or not self.can_stream:
+                raise OSError(
+                    f"Not enough space in {tempdir} to playblast {self._shot.code}"
+                )
+            log.warning(
+                f"Not enough space in {tempdir} for {images_size / 2**20:.0f} MB "
+                f"of frames, streaming {self._shot.code} instead"
+            )
+            stream, cache = True, False
+
+        # each run gets its own scratch dir so concurrent playblasts of the
+        # same shot don't clobber each other
+        scratch = Path(
+            tempfile.mkdtemp(prefix=f"lnd_pb_run_{self._shot.code}_", dir=tempdir)
+        )
         FILENAME = "lnd_pb_temp." + self._shot.code
 
-        # remove any old playblasts
-        for p in tempdir.glob(FILENAME + "*"):
-            p.unlink()
+        def cleanup() -> None:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(f"Keeping playblast scratch files in {scratch}")
+            else:
+                shutil.rmtree(scratch, ignore_errors=True)
 
-        # do the playblast
-        self._write_images(str(tempdir / FILENAME))
+        temp_outs = {
+            preset: f"{scratch / FILENAME}.{preset.name}.{preset.ext}"
+            for preset in out_paths
+        }
+        # precisely define input colorspace
+        in_kwargs = {"r": self.FR, "colorspace": "bt709", "color_trc": "iec61966-2-1"}
+        try:
+            if stream:
+                images = ffmpeg.input(
+                    "pipe:",
+                    format="rawvideo",
+                    pix_fmt="rgb24",
+                    s="{}x{}".format(*self.RESOLUTION),
+                    **in_kwargs,
+                )
+            else:
+                # do the playblast
+                images_path = scratch / FILENAME
+                if cache:
+                    self._write_cached_images(
+                        cache_root / self._shot.code, images_path, tails
+                    )
+                else:
+                    self._write_images(str(images_path))
+                images = ffmpeg.input(
+                    str(images_path) + ".%04d.png",
+                    start_number=start_frame,
+                    **in_kwargs,
+                )
 
-        # use ffmpeg to encode the video
-        start_frame = int(self._shot.cut_in) - tails[0]
-        images = ffmpeg.input(
-            str(tempdir / FILENAME) + ".%04d.png",
-            start_number=start_frame,
-            r=self.FR,
-            # precisely define input colorspace
-            colorspace="bt709",
-            color_trc="iec61966-2-1",
-        )
-        for preset, paths in out_paths.items():
-            out_filename = str(tempdir / FILENAME) + "." + preset.ext
-            ffmpeg.output(
-                images,
-                out_filename,
-                **preset.out_kwargs,
-                timecode="00:00:{:02}:{:02}".format(
-                    start_frame // self.FR,
-                    start_frame % self.FR,
-                ),
-                r=self.FR,
-            ).overwrite_output().run()
-
-            # copy video out of tempdir
-            for path in (Path(str(p) + "." + preset.ext) for p in paths):
-                if not path.parent.exists():
-                    path.parent.mkdir(mode=0o770, parents=True)
-                shutil.copyfile(out_filename, path)
-
-        # clean up if not in debug mode
-        if not log.isEnabledFor(logging.DEBUG):
-            for p in tempdir.glob(FILENAME + "*"):
+            # use ffmpeg to encode the video. All presets are encoded in one
+            # pass so the images are only decoded once
+            encode = None
+            if temp_outs:
+                encode = ffmpeg.merge_outputs(
+                    *(
+                        ffmpeg.output(
+                            images,
+                            out_filename,
+                            **preset.out_kwargs,
+                            timecode=timecode,
+                            r=self.FR,
+                        )
+                        for preset, out_filename in temp_outs.items()
+                    )
+                ).overwrite_output()
+
+                # streaming captures and encodes at the same time
+                if stream:
+                    start = time.time()
+                    self._stream_frames(encode)
+                    info["encode_time"] = time.time() - start
+                    encode = None
+        except BaseException:
+            cleanup()
+            raise
+
+        def inner() -> list[Path]:
+            try:
+                if encode:
+                    start = time.time()
+                    encode.run()
+                    info["encode_time"] = time.time() - start
+
+                finished: list[Path] = []
+                errors: dict[Path, OSError] = {}
+                for preset, paths in out_paths.items():
+                    # copy video out of scratch
+                    dsts = [Path(str(p) + "." + preset.ext) for p in paths]
+                    for path in dsts:
+                        if not path.parent.exists():
+                            path.parent.mkdir(mode=0o770, parents=True)
+                    try:
+                        written = fan_out(Path(temp_outs[preset]), dsts)
+                    except FanOutError as e:
+                        # keep going so the other presets still get copied
+                        written = e.written
+                        errors.update(e.errors)
+                    for path in written:
+                        self._write_sidecar(path, {**info, "preset": preset.name})
+                    finished += written
+                if errors:
+                    raise FanOutError(finished, errors)
+                return finished
+            finally:
+                cleanup()
+
+        return inner
+
+    def _estimate_scratch(
+        self, frames: range, out_paths: dict[PRESET, list[Path | str]]
+    ) -> tuple[int, int]:
+        """Rough upper bound of the bytes of captured frames and encoded
+        videos a playblast of `frames` writes to scratch"""
+        width, height = self.RESOLUTION
+        frame_size = width * height * 3
+        images_size = int(frame_size * self.PNG_RATIO * len(frames))
+
+        videos_size = 0
+        for preset in out_paths:
+            bitrate = str(preset.out_kwargs.get("video_bitrate", ""))
+            if bitrate.endswith("M"):
+                videos_size += int(
+                    float(bitrate[:-1]) * 2**20 / 8 * len(frames) / self.FR
+                )
+            else:
+                videos_size += int(frame_size * self.VIDEO_RATIO * len(frames))
+        return images_size, videos_size
+
+    @classmethod
+    def _remove_stale_scratch(cls, tempdir: Path) -> None:
+        """Remove scratch dirs left behind by crashed playblasts"""
+        for p in tempdir.glob("lnd_pb_run_*"):
+            try:
+                if time.time() - p.stat().st_mtime > cls.STALE_SCRATCH:
+                    log.info(f"Removing stale playblast scratch {p}")
+                    shutil.rmtree(p, ignore_errors=True)
+            except OSError:
+                pass
+
+    @classmethod
+    def _evict_frame_cache(cls, cache_root: Path, keep: str) -> None:
+        """Remove the frame caches of shots that haven't been playblasted in
+        `STALE_FRAME_CACHE` seconds, then the least recently used ones until
+        the cache fits in `FRAME_CACHE_MAX_SIZE`. The cache of `keep`, and
+        caches in use by other playblasts, are left alone"""
+        if not cache_root.is_dir():
+            return
+
+        # (last used, size, dir) of each shot's cache
+        caches: list[tuple[float, int, Path]] = []
+        for cache_dir in cache_root.iterdir():
+            try:
+                files = [p.stat() for p in cache_dir.iterdir()]
+                last_used = max(
+                    (st.st_mtime for st in files), default=cache_dir.stat().st_mtime
+                )
+            except OSError:
+                continue
+            caches.append((last_used, sum(st.st_size for st in files), cache_dir))
+
+        total = sum(size for _, size, _ in caches)
+        cutoff = time.time() - cls.STALE_FRAME_CACHE
+        for last_used, size, cache_dir in sorted(caches):
+            if last_used > cutoff and total <= cls.FRAME_CACHE_MAX_SIZE:
+                break
+            if cache_dir.name == keep:
+                continue
+            manifest_path = cache_dir / "manifest.json"
+            lock = manifest_path.with_name(manifest_path.name + ".lock")
+            try:
+                with file_lock(manifest_path, 0, cls.CACHE_LOCK_STALE):
+                    log.info(f"Removing playblast frame cache {cache_dir}")
+                    for p in cache_dir.iterdir():
+                        if p != lock:
+                            p.unlink()
+            except TimeoutError:
+                continue
+            except OSError as e:
+                log.warning(f"Could not remove frame cache {cache_dir}: {e}")
+                continue
+            total -= size
+            try:
+                cache_dir.rmdir()
+            except OSError:
+                # another playblast started using it
+                pass
+
+    @classmethod
+    def _write_sidecar(cls, path: Path, info: dict[str, Any]) -> None:
+        """Write the metadata of a video to `<video>.json` and add it to the
+        index of its directory, so edit tools can find new playblasts with a
+        single read"""
+        meta = {
+            **info,
+            "file": path.name,
+            "size": path.stat().st_size,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "user": getpass.getuser(),
+            "host": platform.node(),
+        }
+        index_path = path.parent / cls.INDEX_NAME
+        try:
+            write_json_atomic(path.with_name(path.name + ".json"), meta)
+            with file_lock(index_path):
+                try:
+                    index = json.loads(index_path.read_text())
+                except (OSError, ValueError):
+                    index = {"playblasts": {}}
+                index["playblasts"][path.name] = meta
+                index["updated"] = meta["created"]
+                write_json_atomic(index_path, index)
+        except (OSError, TimeoutError) as e:
+            log.warning(f"Could not write the metadata of {path}: {e}")
+
+    def _write_cached_images(
+        self, cache_dir: Path, images_path: Path, tails: tuple[int, int]
+    ) -> None:
+        """Write the frames of the shot to `<images_path>.####.png`, only
+        capturing the frames whose keys changed since the last playblast of
+        this shot and reusing the rest from `cache_dir`.
+
+        The cache is locked while it's updated, so playblasts of the same
+        shot take turns. Frames are linked out of it into `images_path`, and
+        recaptured frames get new files, so the encode never sees another
+        run's frames"""
+        manifest_path = cache_dir / "manifest.json"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with file_lock(
+                manifest_path, self.CACHE_LOCK_TIMEOUT, self.CACHE_LOCK_STALE
+            ):
+                cached_path = self._update_cache(cache_dir, images_path.name, tails)
+                for frame in self._frame_range(tails):
+                    link_or_copy(
+                        Path(f"{cached_path}.{frame:04d}.png"),
+                        Path(f"{images_path}.{frame:04d}.png"),
+                    )
+        except TimeoutError:
+            log.warning(
+                f"The frame cache of {self._shot.code} is in use, capturing without it"
+            )
+            self._write_images(str(images_path))
+
+    def _update_cache(
+        self, cache_dir: Path, filename: str, tails: tuple[int, int]
+    ) -> Path:
+        """Recapture the frames in `cache_dir` whose keys changed. Must hold
+        the cache's lock. Returns the path prefix of the images"""
+        images_path = cache_dir / filename
+        manifest_path = cache_dir / "manifest.json"
+
+        frames = self._frame_range(tails)
+        start = time.perf_counter()
+        keys = self._frame_keys(frames)
+        if keys is None:
+            log.warning(f"{type(self).__name__} doesn't support the frame cache")
+            keys = [""] * len(frames)
+        else:
+            log.info(
+                f"Hashed {len(frames)} frames of {self._shot.code} in "
+                f"{time.perf_counter() - start:.2f}s"
+            )
+
+        try:
+            cached: dict[str, str] = json.loads(manifest_path.read_text())["frames"]
+        except (OSError, ValueError, KeyError):
+            cached = {}
+
+        def png(frame: int) -> Path:
+            return Path(f"{images_path}.{frame:04d}.png")
+
+        dirty = [
+            frame
+            for frame, key in zip(frames, keys)
+            if not key or cached.get(str(frame)) != key or not png(frame).exists()
+        ]
+
+        # frames outside the range would be picked up by the encode
+        for p in cache_dir.glob(filename + ".*.png"):
+            if int(p.suffixes[-2][1:]) not in frames:
                 p.unlink()
 
+        log.info(f"Reusing {len(frames) - len(dirty)} of {len(frames)} cached frames")
+        if dirty:
+            # invalidate first in case the capture fails part way
+            manifest_path.unlink(missing_ok=True)
+            # earlier runs may still be encoding links to the old frames.
+            # Write new files instead of overwriting them
+            for frame in dirty:
+                png(frame).unlink(missing_ok=True)
+            self._write_images(str(images_path), dirty)
+
+        write_json_atomic(
+            manifest_path, {"frames": {str(f): k for f, k in zip(frames, keys) if k}}
+        )
+        return images_path
+
+    def _stream_frames(self, encode: Any) -> None:
+        """Feed frames from `_iter_frames` to the stdin of the FFmpeg process.
+        Frames are handed to a writer thread through a bounded queue, so
+        capture continues while FFmpeg is busy encoding"""
+        assert self._iter_frames is not None
+        proc = encode.run_async(pipe_stdin=True)
+        frames: queue.Queue[bytes | None] = queue.Queue(self.STREAM_QUEUE_SIZE)
+
+        def inner() -> None:
+            broken = False
+            while (frame := frames.get()) is not None:
+                # keep draining after a failure so capture doesn't block
+                if broken:
+                    continue
+                try:
+                    proc.stdin.write(frame)
+                except (BrokenPipeError, OSError):
+                    broken = True
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+        writer = threading.Thread(target=inner, name="PlayblastStream", daemon=True)
+        writer.start()
+        try:
+            for frame in self._iter_frames():
+                frames.put(frame)
+        finally:
+            frames.put(None)
+            writer.join()
+            returncode = proc.wait()
+
+        if returncode:
+            raise ffmpeg.Error("ffmpeg", None, None)
+
     @abstractmethod
-    def playblast(self) -> None:
+    def playblast(self) -> list[PlayblastResult]:
         """Function to be called by the user to trigger a playblast.
-        This should call `_do_playblast` from within a `with self(...)`
-        block.
+        This should call `_do_playblast` (or `_capture`) from within a
+        `with self(...)` block and return a `PlayblastResult` for each shot.
         Looks something like:
-            >>> def playblast(self) -> None:
+            >>> def playblast(self) -> list[PlayblastResult]:
+            >>>     result = PlayblastResult(shot.code)
             >>>     with self(shot):
-            >>>         super()._do_playblast([filepath])
+            >>>         encode = super()._capture({preset: [filepath]})
+            >>>     return [result.encode(encode)]
         """
-        pass
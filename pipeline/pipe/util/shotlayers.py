@@ -0,0 +1,145 @@
+"""The USD layers a shot's stage is built from.
+
+`ShotLayerCache` resolves a shot's camera, override and env layers once per
+session. Layers that change on disk are reloaded when the shot is set up
+again, and the shot is resolved again if its env is reassigned or one of its
+layer files is gone."""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import TYPE_CHECKING
+
+from pxr import Sdf
+from shared.util import get_production_path
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from pipe.struct.db import EnvironmentStub
+
+log = logging.getLogger(__name__)
+
+MAYA_OVERRIDE = "maya_override.usd"
+
+
+class ShotLayers:
+    """The layers a shot's stage is built from, with the modification times
+    they were loaded at. Holding them keeps them in USD's layer registry"""
+
+    camera: Sdf.Layer | None
+    override: Sdf.Layer
+    env: Sdf.Layer | None
+    env_stub: EnvironmentStub | None
+    _mtimes: dict[str, float]
+
+    def __init__(
+        self,
+        camera: Sdf.Layer | None,
+        override: Sdf.Layer,
+        env: Sdf.Layer | None,
+        env_stub: EnvironmentStub | None = None,
+    ) -> None:
+        self.camera = camera
+        self.override = override
+        self.env = env
+        self.env_stub = env_stub
+        self._mtimes = {
+            layer.identifier: os.stat(layer.realPath).st_mtime
+            for layer in self._layers()
+        }
+
+    @classmethod
+    def resolve(
+        cls,
+        root_layer: Sdf.Layer,
+        shot_path: str,
+        env_path: str | None,
+        env_stub: EnvironmentStub | None = None,
+    ) -> ShotLayers:
+        """Find the shot's layers relative to `root_layer`, creating the
+        override layer if its file doesn't exist"""
+        cam_layer = Sdf.Layer.FindOrOpenRelativeToLayer(
+            root_layer, f"{shot_path}/cam/cam.usd"
+        )
+
+        override_layer = Sdf.Layer.FindOrOpenRelativeToLayer(
+            root_layer, f"{shot_path}/set/{MAYA_OVERRIDE}"
+        )
+        if not override_layer:
+            override_path = str(
+                get_production_path() / shot_path / "set" / MAYA_OVERRIDE
+            )
+            # still open if its file was deleted this session
+            if override_layer := Sdf.Layer.Find(override_path):
+                override_layer.Export(override_path)
+            else:
+                override_layer = Sdf.Layer.CreateNew(override_path)
+                override_layer.Save()
+
+        env_layer = None
+        if env_path:
+            env_layer = Sdf.Layer.FindOrOpenRelativeToLayer(
+                root_layer, f"{env_path}/main.usd"
+            )
+
+        return cls(cam_layer, override_layer, env_layer, env_stub)
+
+    def _layers(self) -> list[Sdf.Layer]:
+        return [layer for layer in (self.camera, self.override, self.env) if layer]
+
+    def refresh(self) -> bool:
+        """Reload the layers that changed on disk. False if they have to be
+        resolved again: the camera hasn't been published yet or a layer's
+        file is gone"""
+        if not self.camera:
+            return False
+        for layer in self._layers():
+            try:
+                mtime = os.stat(layer.realPath).st_mtime
+            except OSError:
+                return False
+            if mtime == self._mtimes[layer.identifier]:
+                continue
+            if layer.dirty:
+                log.warning(
+                    f"{layer.identifier} changed on disk, keeping unsaved edits"
+                )
+            else:
+                log.info(f"Reloading {layer.identifier}")
+                layer.Reload()
+            self._mtimes[layer.identifier] = mtime
+        return True
+
+
+class ShotLayerCache:
+    """Each shot's layers, keyed by shot code"""
+
+    _entries: dict[str, ShotLayers]
+
+    def __init__(self) -> None:
+        self._entries = {}
+
+    def get(
+        self,
+        root_layer: Sdf.Layer,
+        shot_code: str,
+        shot_path: str,
+        env_stub: EnvironmentStub | None,
+        find_env_path: Callable[[EnvironmentStub], str | None],
+    ) -> ShotLayers:
+        """The shot's layers, resolved again if they aren't cached, the
+        shot's env is no longer `env_stub` or a layer's file is gone.
+        `find_env_path` looks up the env's path when resolving"""
+        cached = self._entries.get(shot_code)
+        if cached and cached.env_stub == env_stub and cached.refresh():
+            return cached
+
+        env_path = find_env_path(env_stub) if env_stub else None
+        layers = ShotLayers.resolve(root_layer, shot_path, env_path, env_stub)
+        self._entries[shot_code] = layers
+        return layers
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -99,6 +99,23 @@ def get_rigging_path() -> Path:
     return get_character_path() / "Rigging"
 
 
+def mayapy_command(*statements: str) -> str:
+    """Python code for `mayapy -c` that initializes Maya standalone, sets
+    the session up like userSetup does in the GUI (plugins, workspace, USD
+    export chaser) and then runs `statements`"""
+    return ";".join(
+        [
+            "import atexit",
+            "import maya.standalone",
+            "maya.standalone.initialize()",
+            "atexit.register(maya.standalone.uninitialize)",
+            "import userSetup",
+            "userSetup.setup_session()",
+            *statements,
+        ]
+    )
+
+
 def resolve_mapped_path(path: str | Path) -> Path:
     """Windows mapped drive workaround. Adapated from: https://bugs.python.org/msg309160"""
     path = Path(path).resolve()
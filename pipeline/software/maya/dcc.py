@@ -13,7 +13,7 @@ if TYPE_CHECKING:
     import typing
 
 from ..baseclass import DCC
-from shared.util import get_production_path, get_rigging_path
+from shared.util import get_production_path, get_rigging_path, mayapy_command
 from env import Executables
 
 log = logging.getLogger(__name__)
@@ -24,7 +24,12 @@ class MayaDCC(DCC):
 
     shelf_path: str
 
-    def __init__(self, is_python_shell: bool = False) -> None:
+    def __init__(
+        self, is_python_shell: bool = False, python_args: list[str] | None = None
+    ) -> None:
+        """If `python_args` is given with `is_python_shell`, run them
+        (`-m module args...` or `script.py args...`) in mayapy after
+        initializing Maya standalone, instead of opening a shell"""
         this_path = Path(__file__).resolve()
         pipe_path = this_path.parents[2]
 
@@ -87,17 +92,23 @@ class MayaDCC(DCC):
         launch_args: list[str] = []
         if is_python_shell:
             launch_command = str(Executables.mayapy)
-            launch_args = [
-                "-ic",
-                ";".join(
-                    [
-                        "import atexit",
-                        "import maya.standalone",
-                        "maya.standalone.initialize()",
-                        "atexit.register(maya.standalone.uninitialize)",
-                    ]
-                ),
-            ]
+            if python_args:
+                launch_args = [
+                    "-c",
+                    mayapy_command(
+                        "import runpy, sys",
+                        "args = sys.argv[1:]",
+                        "sys.argv = args[1:] if args[0] == '-m' else args",
+                        (
+                            "runpy.run_module(args[1], run_name='__main__', "
+                            "alter_sys=True) if args[0] == '-m' "
+                            "else runpy.run_path(args[0], run_name='__main__')"
+                        ),
+                    ),
+                    *python_args,
+                ]
+            else:
+                launch_args = ["-ic", mayapy_command()]
         else:
             launch_command = str(Executables.maya)
 
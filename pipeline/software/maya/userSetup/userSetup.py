@@ -3,12 +3,14 @@
 import maya.cmds as mc
 
 
-def main():
+def setup_session():
+    """The setup shared by GUI sessions and mayapy (see
+    `shared.util.mayapy_command`)"""
     # Enable required plugins
     plugins = [
         "mayaUsdPlugin",
     ]
-    pluginInfo = mc.pluginInfo(q=True, listPlugins=True)
+    pluginInfo = mc.pluginInfo(q=True, listPlugins=True) or []
     for plugin in plugins:
         if plugin not in pluginInfo:
             mc.loadPlugin(plugin)
@@ -18,11 +20,6 @@ def main():
     # set workspace
     mc.workspace(str(get_production_path().parent), openWorkspace=True)
 
-    # enable timeline-marker plugin
-    from timeline_marker import install  # type: ignore[import-not-found]
-
-    install.execute()
-
     # register USD Export chaser
     import mayaUsd.lib as mayaUsdLib  # type: ignore[import-not-found]
     from pipe.m.usdchaser import ExportChaser
@@ -30,5 +27,14 @@ def main():
     mayaUsdLib.ExportChaser.Register(ExportChaser, ExportChaser.ID)
 
 
+def main():
+    setup_session()
+
+    # enable timeline-marker plugin
+    from timeline_marker import install  # type: ignore[import-not-found]
+
+    install.execute()
+
+
 if not mc.about(batch=True):
     mc.evalDeferred(main)
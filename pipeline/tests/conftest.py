@@ -0,0 +1,72 @@
+"""Lets the tests import `pipe` outside of a DCC and without a configured site.
+
+`pipe/__init__.py` pulls in the database and UI modules, which need the
+site's `env.py` and `env_sg.py`, a Qt binding and the `shotgun_api3`
+submodule. Whichever of those can't be imported is replaced with a stub
+that only supports what the modules do at import time. The tests never call
+into them"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+import types
+from abc import ABCMeta
+from pathlib import Path
+
+
+class _StubMeta(ABCMeta):
+    def __getattr__(cls, name: str) -> _StubObject:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _StubObject()
+
+
+class _StubObject(metaclass=_StubMeta):
+    """Stand-in for any class, enum or function of a stubbed module"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        pass
+
+    def __getattr__(self, name: str) -> _StubObject:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _StubObject()
+
+    def __call__(self, *args, **kwargs) -> _StubObject:
+        return _StubObject()
+
+
+class _StubModule(types.ModuleType):
+    """Module whose every attribute is a subclass of `_StubObject`, so that
+    base classes, enums and decorators used at import time resolve"""
+
+    def __getattr__(self, name: str) -> type:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        stub = _StubMeta(name, (_StubObject,), {"__module__": self.__name__})
+        setattr(self, name, stub)
+        return stub
+
+
+def _stub(name: str, *submodules: str) -> types.ModuleType:
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        pass
+    module = sys.modules[name] = _StubModule(name)
+    for sub in submodules:
+        setattr(module, sub, _stub(f"{name}.{sub}"))
+    return module
+
+
+PIPELINE = Path(__file__).parents[1]
+
+if isinstance(_stub("env"), _StubModule):
+    sys.modules["env"].production_path = PIPELINE.parent  # type: ignore[attr-defined]
+_stub("env_sg")
+_stub("Qt", "QtCore", "QtGui", "QtWidgets")
+
+# the shotgun_api3 submodule may not be checked out
+if not (PIPELINE / "lib" / "shotgun_api3" / "shotgun_api3").is_dir():
+    sys.modules["pipe.db.shotgun_api3"] = _StubModule("pipe.db.shotgun_api3")
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+from pipe.util import fileops
+
+
+def test_fan_out_same_filesystem_skips_digest(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    src = tmp_path / "src.mov"
+    src.write_bytes(b"frames")
+    dsts = [tmp_path / f"dst{i}.mov" for i in range(3)]
+
+    def no_digest(path: Path | str, algorithm: str = "sha1") -> str:
+        raise AssertionError(f"{path} was hashed")
+
+    monkeypatch.setattr(fileops, "file_digest", no_digest)
+    assert fileops.fan_out(src, dsts) == dsts
+    assert all(dst.read_bytes() == b"frames" for dst in dsts)
+
+
+def test_verified_copy_rejects_corrupt_copy(tmp_path: Path) -> None:
+    src = tmp_path / "src.mov"
+    src.write_bytes(b"frames")
+    dst = tmp_path / "dst.mov"
+
+    fileops._verified_copy(src, dst, lambda: fileops.file_digest(src))
+    assert dst.read_bytes() == b"frames"
+
+    dst.unlink()
+    with pytest.raises(OSError, match="corrupt"):
+        fileops._verified_copy(src, dst, lambda: "0" * 40)
+    assert not dst.exists()
+    assert list(tmp_path.iterdir()) == [src]
+
+
+def _lock_path(path: Path) -> Path:
+    return path.with_name(path.name + ".lock")
+
+
+def test_file_lock_reclaims_stale_lock(tmp_path: Path) -> None:
+    index = tmp_path / "index.json"
+    lock = _lock_path(index)
+    lock.write_text("host 1 crashed")
+    os.utime(lock, (0, 0))
+
+    with fileops.file_lock(index, timeout=1):
+        assert lock.read_text() != "host 1 crashed"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_file_lock_times_out(tmp_path: Path) -> None:
+    index = tmp_path / "index.json"
+    _lock_path(index).write_text("host 1 alive")
+
+    with pytest.raises(TimeoutError), fileops.file_lock(index, timeout=0.2):
+        pass
+    assert _lock_path(index).read_text() == "host 1 alive"
+
+
+def test_file_lock_keeps_lock_that_replaced_it(tmp_path: Path) -> None:
+    index = tmp_path / "index.json"
+    lock = _lock_path(index)
+
+    with fileops.file_lock(index):
+        # reclaimed while held, e.g. after a long stall
+        lock.unlink()
+        lock.write_text("host 2 other")
+    assert lock.read_text() == "host 2 other"
+    assert list(tmp_path.iterdir()) == [lock]
+
+
+def test_remove_lock_restores_other_owner(tmp_path: Path) -> None:
+    lock = _lock_path(tmp_path / "index.json")
+    lock.write_text("host 2 fresh")
+
+    # a waiter that judged a lock stale just before it was replaced
+    assert not fileops._remove_lock(lock, "host 1 crashed")
+    assert lock.read_text() == "host 2 fresh"
+    assert list(tmp_path.iterdir()) == [lock]
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("ffmpeg")
+
+from pipe.util.fileops import file_lock
+from pipe.util.playblaster import Playblaster
+
+DAY = 24 * 60 * 60
+
+
+def _write_cache(cache_root: Path, shot: str, size: int, age: float) -> Path:
+    cache_dir = cache_root / shot
+    cache_dir.mkdir(parents=True)
+    mtime = time.time() - age
+    for path in (
+        cache_dir / f"lnd_pb_temp.{shot}.1001.png",
+        cache_dir / "manifest.json",
+    ):
+        path.write_bytes(b"\0" * (size // 2))
+        os.utime(path, (mtime, mtime))
+    return cache_dir
+
+
+def test_evict_stale_frame_cache(tmp_path: Path) -> None:
+    stale = _write_cache(tmp_path, "A", 10, 30 * DAY)
+    fresh = _write_cache(tmp_path, "B", 10, 0)
+    kept = _write_cache(tmp_path, "C", 10, 30 * DAY)
+
+    Playblaster._evict_frame_cache(tmp_path, "C")
+    assert not stale.exists()
+    assert fresh.exists() and kept.exists()
+
+
+def test_evict_frame_cache_to_size(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(Playblaster, "FRAME_CACHE_MAX_SIZE", 25)
+    oldest = _write_cache(tmp_path, "A", 10, 3 * 60)
+    older = _write_cache(tmp_path, "B", 10, 2 * 60)
+    newest = _write_cache(tmp_path, "C", 10, 60)
+
+    Playblaster._evict_frame_cache(tmp_path, "D")
+    assert not oldest.exists()
+    assert older.exists() and newest.exists()
+
+
+def test_evict_skips_frame_cache_in_use(tmp_path: Path) -> None:
+    cache_dir = _write_cache(tmp_path, "A", 10, 30 * DAY)
+
+    with file_lock(cache_dir / "manifest.json"):
+        Playblaster._evict_frame_cache(tmp_path, "B")
+        assert (cache_dir / "manifest.json").exists()
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pxr")
+
+from pipe.struct.db import EnvironmentStub
+from pipe.util import shotlayers
+from pxr import Sdf
+
+SHOT_PATH = "shot/A"
+ENV = EnvironmentStub(1, "Env")
+ENV_PATH = "env/E"
+
+
+@pytest.fixture
+def production(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A production tree with a published camera and env"""
+    monkeypatch.setattr(shotlayers, "get_production_path", lambda: tmp_path)
+    (tmp_path / SHOT_PATH / "cam").mkdir(parents=True)
+    (tmp_path / SHOT_PATH / "set").mkdir()
+    (tmp_path / ENV_PATH).mkdir(parents=True)
+    _write_layer(tmp_path / SHOT_PATH / "cam" / "cam.usd", "v1")
+    _write_layer(tmp_path / ENV_PATH / "main.usd", "env")
+    return tmp_path
+
+
+@pytest.fixture
+def root_layer(production: Path) -> Sdf.Layer:
+    layer = Sdf.Layer.CreateNew(str(production / "maya_root.usd"))
+    layer.Save()
+    return layer
+
+
+def _write_layer(path: Path, comment: str) -> None:
+    layer = Sdf.Layer.CreateAnonymous(".usd")
+    layer.comment = comment
+    layer.Export(str(path))
+
+
+def _bump_mtime(path: Path) -> None:
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + 10))
+
+
+class _EnvPaths:
+    """`find_env_path` that counts its lookups"""
+
+    def __init__(self) -> None:
+        self.lookups = 0
+
+    def __call__(self, stub: EnvironmentStub) -> str | None:
+        self.lookups += 1
+        return ENV_PATH if stub == ENV else None
+
+
+def test_cache_hit(production: Path, root_layer: Sdf.Layer) -> None:
+    cache = shotlayers.ShotLayerCache()
+    env_paths = _EnvPaths()
+
+    layers = cache.get(root_layer, "A", SHOT_PATH, ENV, env_paths)
+    assert layers.camera and layers.camera.comment == "v1"
+    assert layers.env and layers.env.comment == "env"
+    assert (production / SHOT_PATH / "set" / shotlayers.MAYA_OVERRIDE).is_file()
+
+    assert cache.get(root_layer, "A", SHOT_PATH, ENV, env_paths) is layers
+    assert env_paths.lookups == 1
+
+
+def test_reload_changed_layer(production: Path, root_layer: Sdf.Layer) -> None:
+    cache = shotlayers.ShotLayerCache()
+    layers = cache.get(root_layer, "A", SHOT_PATH, ENV, _EnvPaths())
+
+    cam_path = production / SHOT_PATH / "cam" / "cam.usd"
+    _write_layer(cam_path, "v2")
+    _bump_mtime(cam_path)
+
+    assert cache.get(root_layer, "A", SHOT_PATH, ENV, _EnvPaths()) is layers
+    assert layers.camera and layers.camera.comment == "v2"
+
+
+def test_resolve_deleted_layer(production: Path, root_layer: Sdf.Layer) -> None:
+    cache = shotlayers.ShotLayerCache()
+    layers = cache.get(root_layer, "A", SHOT_PATH, ENV, _EnvPaths())
+
+    override_path = production / SHOT_PATH / "set" / shotlayers.MAYA_OVERRIDE
+    (production / SHOT_PATH / "cam" / "cam.usd").unlink()
+    override_path.unlink()
+
+    resolved = cache.get(root_layer, "A", SHOT_PATH, ENV, _EnvPaths())
+    assert resolved is not layers
+    assert resolved.camera is None
+    assert override_path.is_file()
+
+
+def test_resolve_reassigned_env(production: Path, root_layer: Sdf.Layer) -> None:
+    cache = shotlayers.ShotLayerCache()
+    layers = cache.get(root_layer, "A", SHOT_PATH, ENV, _EnvPaths())
+
+    resolved = cache.get(root_layer, "A", SHOT_PATH, None, _EnvPaths())
+    assert resolved is not layers
+    assert resolved.env is None
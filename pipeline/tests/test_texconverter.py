@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+import numpy as np
+from PIL import Image
+from pipe.texconverter import TexConverter
+
+TILE_SIZE = (24, 16)  # width, height
+
+
+def _write_tiles(tmp_path: Path, count: int) -> list[str]:
+    rng = np.random.default_rng(count)
+    width, height = TILE_SIZE
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"tile.{1001 + i}.png"
+        pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        Image.fromarray(pixels, "RGB").save(path)
+        paths.append(str(path))
+    return paths
+
+
+def _box_mean(mosaic: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    """Average each `rows` x `cols` block of pixels"""
+    height, width = mosaic.shape[0] // rows, mosaic.shape[1] // cols
+    blocks = mosaic.reshape(height, rows, width, cols, 3).astype(np.float64)
+    return blocks.mean(axis=(1, 3))
+
+
+def _build_mosaic(imgs: list[str]) -> np.ndarray:
+    with ThreadPoolExecutor(4) as pool:
+        return TexConverter._build_mosaic(pool, imgs)
+
+
+@pytest.mark.parametrize("count", [1, 5, 6, 10])
+def test_mosaic_matches_naive(tmp_path: Path, count: int) -> None:
+    imgs = _write_tiles(tmp_path, count)
+    cols, rows = TexConverter._preview_grid(count)
+
+    # lay the whole mosaic out in memory, leaving any unused cells black
+    width, height = TILE_SIZE
+    mosaic = np.zeros((rows * height, cols * width, 3), dtype=np.uint8)
+    for idx, img in enumerate(imgs):
+        row, col = divmod(idx, cols)
+        mosaic[row * height : (row + 1) * height, col * width : (col + 1) * width] = (
+            np.asarray(Image.open(img))
+        )
+
+    out = _build_mosaic(imgs)
+    assert out.shape == (height, width, 3)
+    diff = np.abs(out.astype(np.int16) - _box_mean(mosaic, rows, cols).round())
+    assert diff.max() <= 1
+
+
+def test_mosaic_matches_oiiotool(tmp_path: Path) -> None:
+    """Compare the layout with `oiiotool --mosaic`. The box filter is done
+    here since oiiotool's `--resize` uses a different filter"""
+    oiiotool = shutil.which("oiiotool")
+    if not oiiotool:
+        pytest.skip("oiiotool is not available")
+
+    imgs = _write_tiles(tmp_path, 6)
+    cols, rows = TexConverter._preview_grid(len(imgs))
+    mosaic_path = tmp_path / "mosaic.png"
+    subprocess.run(
+        [oiiotool, *imgs, "--mosaic", f"{cols}x{rows}", "-o", str(mosaic_path)],
+        check=True,
+    )
+    mosaic = np.asarray(Image.open(mosaic_path).convert("RGB"))
+
+    diff = np.abs(
+        _build_mosaic(imgs).astype(np.int16) - _box_mean(mosaic, rows, cols).round()
+    )
+    assert diff.max() <= 1
+
+
+def test_mosaic_rejects_mixed_resolutions(tmp_path: Path) -> None:
+    imgs = _write_tiles(tmp_path, 2)
+    Image.new("RGB", (8, 8)).save(imgs[1])
+    with pytest.raises(ValueError):
+        _build_mosaic(imgs)
+
+
+def test_prune_store(tmp_path: Path) -> None:
+    store = tmp_path / "store"
+    tex_dir = tmp_path / "variants" / "main" / "tex"
+    (store / "ab").mkdir(parents=True)
+    (store / "cd").mkdir()
+    tex_dir.mkdir(parents=True)
+
+    hardlinked = store / "ab" / "hardlinked.tex"
+    symlinked = store / "ab" / "symlinked.tex"
+    unused = store / "cd" / "unused.tex"
+    for stored in (hardlinked, symlinked, unused):
+        stored.write_bytes(b"tex")
+    os.link(hardlinked, tex_dir / "a.tex")
+    (tex_dir / "b.tex").symlink_to(symlinked)
+
+    converter = TexConverter(tex_dir, tmp_path / "preview.jpg", [], store=store)
+    assert converter.prune_store([tex_dir]) == []
+
+    converter.STORE_PRUNE_AGE = 0
+    assert converter.prune_store([tex_dir]) == [unused]
+    assert hardlinked.exists() and symlinked.exists()
+    assert not (store / "cd").exists()